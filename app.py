@@ -17,16 +17,18 @@ load_dotenv()
 import os
 import sys
 import json
+import csv
 import random
 import re
-import requests
-import stripe
-import ollama
-from io import BytesIO
-import smtplib
-from email.message import EmailMessage
+import hashlib
+import threading
+import time
+from io import BytesIO, TextIOWrapper
 import secrets
 import subprocess
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
 
 from flask import (
     Flask,
@@ -37,21 +39,23 @@ from flask import (
     session,
     abort,
     flash,
+    jsonify,
+    Response,
+    stream_with_context,
 )
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
-import stripe
+from jinja2 import FileSystemBytecodeCache
 
-from cryptography.fernet import Fernet
-import ollama
-from markdown import markdown
-from bs4 import BeautifulSoup
-import random
-import requests
+# reportlab, stripe, cryptography, markdown, bs4, requests and smtplib are
+# imported where they are used so scripts that only need the models start quickly
 from werkzeug.utils import secure_filename
 from sqlalchemy import inspect, text
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import contains_eager, joinedload, load_only, selectinload
+
+from llm_backends import get_backend
+from similarity import MinHashIndex
 
 
 app = Flask(__name__)
@@ -76,6 +80,15 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     "pool_size": 5,  # Smaller pool size
 }
 app.secret_key = os.environ.get("SECRET_KEY", "secret")
+# Compiled templates are kept on disk so fresh processes skip recompiling them
+_jinja_cache_dir = os.environ.get(
+    "JINJA_CACHE_DIR", os.path.join(app.instance_path, "jinja_cache")
+)
+try:
+    os.makedirs(_jinja_cache_dir, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(_jinja_cache_dir)
+except OSError as e:
+    print(f"[WARN] Jinja bytecode cache disabled: {e}")
 db = SQLAlchemy(app)
 
 # Database retry helper for connection issues
@@ -92,41 +105,104 @@ def retry_db_operation(operation, max_retries=3, delay=1):
                 raise e
             app.logger.warning(f"Database operation failed (attempt {attempt + 1}/{max_retries}): {e}")
             time.sleep(delay * (2 ** attempt))  # Exponential backoff
-stripe.api_key = os.environ.get("STRIPE_SECRET_KEY")
+
+
+def get_stripe():
+    """Return the stripe module configured with the secret key."""
+    import stripe
+
+    stripe.api_key = os.environ.get("STRIPE_SECRET_KEY")
+    return stripe
+
 
 # Encryption key used to protect personal information
 _key = os.environ.get("ENCRYPT_KEY")
-if not _key:
-    _key = Fernet.generate_key()
-fernet = Fernet(_key)
+_fernet = None
 
 
-# Markdown filter to render AI-generated text nicely
-@app.template_filter("markdown")
-def markdown_filter(text: str) -> str:
+def get_fernet():
+    global _key, _fernet
+    if _fernet is None:
+        from cryptography.fernet import Fernet
+
+        if not _key:
+            _key = Fernet.generate_key()
+        _fernet = Fernet(_key)
+    return _fernet
+
+
+def render_markdown(text: str) -> str:
     """Convert Markdown text to sanitized HTML."""
+    from markdown import markdown
+    from bs4 import BeautifulSoup
+
     html = markdown(text or "", extensions=["extra"])
     return str(BeautifulSoup(html, "html.parser"))
 
 
+# Stored content is rendered when it is saved (see ``store_rendered_html``);
+# the filter remembers recent results for text rendered in templates
+MARKDOWN_MEMO_SIZE = int(os.environ.get("MARKDOWN_MEMO_SIZE", "256"))
+
+
+# Markdown filter to render AI-generated text nicely
+@app.template_filter("markdown")
+@functools.lru_cache(maxsize=MARKDOWN_MEMO_SIZE)
+def markdown_filter(text: str) -> str:
+    return render_markdown(text)
+
+
+def markdown_hash(text: str | None) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def store_rendered_html(obj, field: str = "content") -> bool:
+    """Render ``obj.<field>`` into ``<field>_html`` unless the stored HTML
+    already matches the text. Returns whether it was rendered."""
+    text = getattr(obj, field)
+    digest = markdown_hash(text)
+    if getattr(obj, f"{field}_html") is not None and getattr(obj, f"{field}_hash") == digest:
+        return False
+    setattr(obj, f"{field}_html", render_markdown(text))
+    setattr(obj, f"{field}_hash", digest)
+    return True
+
+
+@app.template_filter("rendered")
+def rendered_filter(obj, field: str = "content") -> str:
+    """HTML stored for ``obj.<field>``, or the text rendered now if it was
+    changed without updating the HTML."""
+    if not obj:
+        return ""
+    text = getattr(obj, field)
+    html = getattr(obj, f"{field}_html")
+    if html is not None and getattr(obj, f"{field}_hash") == markdown_hash(text):
+        return html
+    return markdown_filter(text)
+
+
 # Simple helpers to encrypt and decrypt text
 def encrypt(text: str) -> bytes:
     if not text:
         return None
-    return fernet.encrypt(text.encode())
+    return get_fernet().encrypt(text.encode())
 
 
 def decrypt(token: bytes) -> str:
     if not token:
         return ""
-    return fernet.decrypt(token).decode()
+    return get_fernet().decrypt(token).decode()
 
 
 class BlogPost(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    content_html = db.Column(db.Text)
+    content_hash = db.Column(db.String(64))
+    # News headline the post was based on, used to avoid covering it twice
+    source_title = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, index=True)
 
 
 class Company(db.Model):
@@ -140,9 +216,9 @@ class User(db.Model):
     password_hash = db.Column(db.String(200), nullable=False)
     is_admin = db.Column(db.Boolean, default=False)
     is_company_admin = db.Column(db.Boolean, default=False)
-    company_id = db.Column(db.Integer, db.ForeignKey("company.id"))
+    company_id = db.Column(db.Integer, db.ForeignKey("company.id"), index=True)
     company = db.relationship("Company", backref="users")
-    reset_token = db.Column(db.String(200))
+    reset_token = db.Column(db.String(200), index=True)
     reset_token_expires = db.Column(db.DateTime)
 
 
@@ -150,11 +226,13 @@ class Course(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
+    description_html = db.Column(db.Text)
+    description_hash = db.Column(db.String(64))
     difficulty = db.Column(db.String(20), nullable=False)
     prerequisites = db.Column(db.Text)
     # Optional icon image filename stored in static/uploads
     icon = db.Column(db.String(200))
-    company_id = db.Column(db.Integer, db.ForeignKey("company.id"))
+    company_id = db.Column(db.Integer, db.ForeignKey("company.id"), index=True)
     company = db.relationship("Company", backref="courses")
     price_cents = db.Column(db.Integer, default=0)
 
@@ -168,6 +246,8 @@ class CourseSection(db.Model):
     )
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
+    content_html = db.Column(db.Text)
+    content_hash = db.Column(db.String(64))
     question = db.Column(db.Text)
     answer = db.Column(db.String(200))
     order = db.Column(db.Integer)
@@ -180,6 +260,7 @@ class CourseSection(db.Model):
             cascade="all, delete-orphan",
         ),
     )
+    __table_args__ = (db.Index("ix_course_section_course_order", "course_id", "order"),)
 
 
 class SectionProgress(db.Model):
@@ -192,10 +273,28 @@ class SectionProgress(db.Model):
     __table_args__ = (db.UniqueConstraint("user_id", "section_id", name="uix_user_section"),)
 
 
-class Enrollment(db.Model):
+class CourseProgress(db.Model):
+    """Per-user summary of a course, kept in step with ``SectionProgress``.
+
+    ``rebuild_progress.py`` recomputes it from the section rows.
+    """
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey("course.id"), nullable=False)
+    sections_completed = db.Column(db.Integer, nullable=False, default=0)
+    total_sections = db.Column(db.Integer, nullable=False, default=0)
+    quiz_passed = db.Column(db.Boolean, nullable=False, default=False)
+    completed_at = db.Column(db.DateTime)
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "course_id", name="uix_progress_user_course"),
+    )
+
+
+class Enrollment(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey("course.id"), nullable=False, index=True)
     paid = db.Column(db.Boolean, default=False)
     is_mandatory = db.Column(db.Boolean, default=False)  # True = obligatorio, False = opcional
     assigned_by = db.Column(db.Integer, db.ForeignKey("user.id"))  # Admin que asignó el curso
@@ -229,6 +328,7 @@ class QuizQuestion(db.Model):
             cascade="all, delete-orphan",
         ),
     )
+    __table_args__ = (db.Index("ix_quiz_question_course_order", "course_id", "order"),)
 
 
 class Page(db.Model):
@@ -236,14 +336,16 @@ class Page(db.Model):
     slug = db.Column(db.String(50), unique=True, nullable=False)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
+    content_html = db.Column(db.Text)
+    content_hash = db.Column(db.String(64))
 
 
 class NewsItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
-    url = db.Column(db.String(500), nullable=False)
+    url = db.Column(db.String(500), nullable=False, index=True)
     summary = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, index=True)
 
 
 class ContactMessage(db.Model):
@@ -260,17 +362,108 @@ class SiteSetting(db.Model):
     value = db.Column(db.Text)
 
 
+class Job(db.Model):
+    """Long-running admin action executed by ``worker.py``."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text)
+    status = db.Column(db.String(20), default="queued", nullable=False, index=True)
+    stage = db.Column(db.String(200))
+    tokens = db.Column(db.Integer, default=0)
+    cancel_requested = db.Column(db.Boolean, default=False)
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "tokens": self.tokens or 0,
+            "cancel_requested": bool(self.cancel_requested),
+            "payload": json.loads(self.payload or "{}"),
+            "result": json.loads(self.result) if self.result else None,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class LLMCall(db.Model):
+    """Timing and token counts of one ``generate_text`` call."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    purpose = db.Column(db.String(50), nullable=False, index=True)
+    backend = db.Column(db.String(20))
+    model = db.Column(db.String(100))
+    cached = db.Column(db.Boolean, default=False)
+    attempt = db.Column(db.Integer, default=0)
+    wall_ms = db.Column(db.Integer)
+    ttft_ms = db.Column(db.Integer)
+    prompt_tokens = db.Column(db.Integer)
+    completion_tokens = db.Column(db.Integer)
+    # Limit that cut the answer short: max_tokens, deadline or cancelled
+    truncated = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+
+# All settings are kept in memory and reloaded with one query once they are
+# SETTINGS_CACHE_TTL seconds old, so other processes see a change within that
+# time. set_setting updates this process's copy immediately.
+SETTINGS_CACHE_TTL = float(os.environ.get("SETTINGS_CACHE_TTL", "5"))
+_settings_cache: dict[str, str | None] = {}
+_settings_loaded = False
+_settings_loaded_at = None
+_settings_lock = threading.Lock()
+settings_cache_stats = {"hits": 0, "reloads": 0, "errors": 0}
+
+
+def _load_settings() -> None:
+    """Read every setting and swap the cache. The query runs without the lock
+    so a slow or failing database does not hold up other requests."""
+    global _settings_cache, _settings_loaded
+    rows = retry_db_operation(
+        lambda: db.session.execute(db.select(SiteSetting.key, SiteSetting.value)).all()
+    )
+    with _settings_lock:
+        _settings_cache = dict(rows)
+        _settings_loaded = True
+        settings_cache_stats["reloads"] += 1
+
+
 def get_setting(key: str, default: str | None = None) -> str | None:
-    def _get_setting():
-        setting = SiteSetting.query.filter_by(key=key).first()
-        return setting.value if setting else default
-    
-    try:
-        return retry_db_operation(_get_setting)
-    except Exception as e:
-        # Log the error and return default value if database is unavailable
-        print(f"[WARN] get_setting error for key '{key}': {e}")
-        return default
+    global _settings_loaded_at
+    with _settings_lock:
+        now = time.monotonic()
+        reload = _settings_loaded_at is None or now - _settings_loaded_at > SETTINGS_CACHE_TTL
+        if reload:
+            # Claim the reload: other requests keep serving the cached values
+            # and a database that is down is only retried once per TTL
+            _settings_loaded_at = now
+        elif _settings_loaded:
+            settings_cache_stats["hits"] += 1
+        # Until the first load succeeds there are no values to fall back on
+        reload = reload or not _settings_loaded
+    if reload:
+        try:
+            _load_settings()
+        except Exception as e:
+            # Keep serving the last known values while the database is down
+            with _settings_lock:
+                settings_cache_stats["errors"] += 1
+            print(f"[WARN] get_setting error for key '{key}': {e}")
+            try:
+                db.session.rollback()
+            except Exception:
+                pass
+    value = _settings_cache.get(key)
+    return value if value is not None else default
 
 
 def set_setting(key: str, value: str) -> None:
@@ -282,6 +475,8 @@ def set_setting(key: str, value: str) -> None:
             setting = SiteSetting(key=key, value=value)
             db.session.add(setting)
         db.session.commit()
+        with _settings_lock:
+            _settings_cache[key] = value
     except Exception as e:
         print(f"[WARN] set_setting error for key '{key}': {e}")
         try:
@@ -379,6 +574,288 @@ def user_can_get_certificate(course: Course, user_id: int | None) -> bool:
     return True
 
 
+def load_course_progress(user_id: int, courses: list[Course]) -> dict[int, dict]:
+    """Return the progress of ``user_id`` in each of ``courses`` by course id.
+
+    The ``CourseProgress`` rows and the enrollments are read with one query
+    each, however many courses there are. Every entry has ``sections``,
+    ``completed``, ``all_done``, ``quiz_passed``, ``enrolled`` and ``paid``;
+    courses the user has not started count as zero sections done.
+    """
+    course_ids = [course.id for course in courses]
+    if not course_ids:
+        return {}
+    rows = {
+        row.course_id: row
+        for row in db.session.execute(
+            db.select(
+                CourseProgress.course_id,
+                CourseProgress.sections_completed,
+                CourseProgress.total_sections,
+                CourseProgress.quiz_passed,
+            ).where(
+                CourseProgress.user_id == user_id,
+                CourseProgress.course_id.in_(course_ids),
+            )
+        )
+    }
+    enrollments = dict(
+        db.session.execute(
+            db.select(Enrollment.course_id, Enrollment.paid).where(
+                Enrollment.user_id == user_id, Enrollment.course_id.in_(course_ids)
+            )
+        ).all()
+    )
+    progress = {}
+    for course_id in course_ids:
+        row = rows.get(course_id)
+        sections = row.total_sections if row else 0
+        done = row.sections_completed if row else 0
+        progress[course_id] = {
+            "sections": sections,
+            "completed": done,
+            "all_done": sections > 0 and done >= sections,
+            "quiz_passed": bool(row and row.quiz_passed),
+            "enrolled": course_id in enrollments,
+            "paid": bool(enrollments.get(course_id)),
+        }
+    return progress
+
+
+def upsert(table, rows: list[dict], keys: tuple[str, ...], update=None):
+    """Insert ``rows`` into ``table`` in one statement.
+
+    Rows clashing with an existing one on the unique ``keys`` are skipped,
+    or, with ``update``, the existing row is updated with the columns of
+    ``update(new)``, where ``new`` gives the values the row would have been
+    inserted with (``new.column``).
+    """
+    dialect = db.engine.dialect.name
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+
+        stmt = insert(table).values(rows)
+        if update:
+            stmt = stmt.on_duplicate_key_update(update(stmt.inserted))
+        else:
+            stmt = stmt.prefix_with("IGNORE")
+    elif dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+
+        stmt = insert(table).values(rows)
+        if update:
+            stmt = stmt.on_conflict_do_update(index_elements=keys, set_=update(stmt.excluded))
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=keys)
+    else:
+        raise NotImplementedError(f"upsert is not supported on {dialect}")
+    return db.session.execute(stmt)
+
+
+def _completed_sections_count(user_id: int, course_id: int):
+    return (
+        db.select(db.func.count(SectionProgress.id))
+        .join(CourseSection, SectionProgress.section_id == CourseSection.id)
+        .where(
+            SectionProgress.user_id == user_id,
+            SectionProgress.completed == True,  # noqa: E712
+            CourseSection.course_id == course_id,
+        )
+        .scalar_subquery()
+    )
+
+
+def _course_sections_count(course_id):
+    return (
+        db.select(db.func.count(CourseSection.id))
+        .where(CourseSection.course_id == course_id)
+        .scalar_subquery()
+    )
+
+
+def refresh_course_completion(*where) -> None:
+    """Set or clear ``completed_at`` of the ``CourseProgress`` rows matching
+    ``where`` from their counts and quiz result."""
+    cp = CourseProgress.__table__
+    done = db.and_(
+        cp.c.quiz_passed == True,  # noqa: E712
+        cp.c.total_sections > 0,
+        cp.c.sections_completed >= cp.c.total_sections,
+    )
+    db.session.execute(
+        cp.update()
+        .where(*where)
+        .values(
+            completed_at=db.case(
+                (done, db.func.coalesce(cp.c.completed_at, datetime.datetime.utcnow())),
+                else_=None,
+            )
+        )
+    )
+
+
+def record_section_completed(user_id: int, course_id: int, section_id: int) -> bool:
+    """Store a completed section and count it in the user's ``CourseProgress``.
+
+    Returns ``False`` when the section had already been completed.
+    """
+    result = upsert(
+        SectionProgress.__table__,
+        [{"user_id": user_id, "section_id": section_id, "completed": True}],
+        ("user_id", "section_id"),
+    )
+    if result.rowcount != 1:
+        return False
+    cp = CourseProgress.__table__
+    upsert(
+        cp,
+        [
+            {
+                "user_id": user_id,
+                "course_id": course_id,
+                "sections_completed": _completed_sections_count(user_id, course_id),
+                "total_sections": _course_sections_count(course_id),
+                "quiz_passed": False,
+            }
+        ],
+        ("user_id", "course_id"),
+        update=lambda new: {"sections_completed": cp.c.sections_completed + 1},
+    )
+    refresh_course_completion(cp.c.user_id == user_id, cp.c.course_id == course_id)
+    db.session.commit()
+    return True
+
+
+def record_quiz_passed(user_id: int, course_id: int) -> None:
+    cp = CourseProgress.__table__
+    upsert(
+        cp,
+        [
+            {
+                "user_id": user_id,
+                "course_id": course_id,
+                "sections_completed": _completed_sections_count(user_id, course_id),
+                "total_sections": _course_sections_count(course_id),
+                "quiz_passed": True,
+            }
+        ],
+        ("user_id", "course_id"),
+        update=lambda new: {"quiz_passed": True},
+    )
+    refresh_course_completion(cp.c.user_id == user_id, cp.c.course_id == course_id)
+    db.session.commit()
+
+
+def rebuild_course_progress(course_id: int | None = None) -> int:
+    """Recompute ``CourseProgress`` from ``SectionProgress`` for one course
+    or all of them and return the number of rows with progress. Quiz results
+    are kept. Used after sections are added or removed."""
+    cp = CourseProgress.__table__
+    scope = [cp.c.course_id == course_id] if course_id else []
+    db.session.execute(
+        cp.update()
+        .where(*scope)
+        .values(sections_completed=0, total_sections=_course_sections_count(cp.c.course_id))
+    )
+    totals_query = db.select(CourseSection.course_id, db.func.count(CourseSection.id))
+    counts_query = (
+        db.select(SectionProgress.user_id, CourseSection.course_id, db.func.count())
+        .join(CourseSection, SectionProgress.section_id == CourseSection.id)
+        .where(SectionProgress.completed == True)  # noqa: E712
+    )
+    if course_id:
+        totals_query = totals_query.where(CourseSection.course_id == course_id)
+        counts_query = counts_query.where(CourseSection.course_id == course_id)
+    totals = dict(db.session.execute(totals_query.group_by(CourseSection.course_id)).all())
+    rows = [
+        {
+            "user_id": user_id,
+            "course_id": row_course_id,
+            "sections_completed": count,
+            "total_sections": totals.get(row_course_id, 0),
+            "quiz_passed": False,
+        }
+        for user_id, row_course_id, count in db.session.execute(
+            counts_query.group_by(SectionProgress.user_id, CourseSection.course_id)
+        )
+    ]
+    for start in range(0, len(rows), 500):
+        upsert(
+            cp,
+            rows[start : start + 500],
+            ("user_id", "course_id"),
+            update=lambda new: {
+                "sections_completed": new.sections_completed,
+                "total_sections": new.total_sections,
+            },
+        )
+    refresh_course_completion(*scope)
+    db.session.commit()
+    return len(rows)
+
+
+# Markdown columns stored together with their rendered HTML
+RENDERED_FIELDS = (
+    (BlogPost, "content"),
+    (Course, "description"),
+    (CourseSection, "content"),
+    (Page, "content"),
+)
+
+
+def render_stored_html(force: bool = False, batch_size: int = 100) -> int:
+    """Render the stored HTML of rows whose text changed since it was last
+    rendered (every row with ``force``) and return how many were rendered."""
+    rendered = 0
+    for model, field in RENDERED_FIELDS:
+        last_id = 0
+        while True:
+            rows = (
+                model.query.filter(model.id > last_id)
+                .order_by(model.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+            for row in rows:
+                if force:
+                    setattr(row, f"{field}_html", None)
+                rendered += store_rendered_html(row, field)
+            db.session.commit()
+            last_id = rows[-1].id
+    return rendered
+
+
+def completed_section_ids(user_id: int, course_id: int) -> list[int]:
+    """Return the ids of the sections of ``course_id`` completed by ``user_id``."""
+    return list(
+        db.session.execute(
+            db.select(SectionProgress.section_id)
+            .join(CourseSection, SectionProgress.section_id == CourseSection.id)
+            .where(
+                SectionProgress.user_id == user_id,
+                SectionProgress.completed == True,  # noqa: E712
+                CourseSection.course_id == course_id,
+            )
+        ).scalars()
+    )
+
+
+def certificate_allowed(course: Course, user: User | None, progress: dict) -> bool:
+    """``user_can_get_certificate`` using an entry of ``load_course_progress``."""
+    if user is None:
+        return False
+    if course.company_id is not None:
+        return user.company_id == course.company_id and progress["enrolled"]
+    if course.price_cents and course.price_cents > 0:
+        return progress["paid"]
+    return True
+
+
 def require_course_access(course: Course):
     user_id = session.get("user_id")
     if not user_has_course_access(course, user_id):
@@ -394,14 +871,512 @@ def require_login():
         return redirect(url_for("login"))
 
 
-def generate_text(prompt: str) -> str:
-    """Generate text from the local Llama 3 model via ollama."""
-    stream = ollama.chat(
-        model="llama3:8b",
-        messages=[{"role": "user", "content": prompt}],
-        stream=True,
+class GenerationCancelled(Exception):
+    """Raised inside a generation when its job has been cancelled."""
+
+
+# Listener notified of generation stages and streamed tokens. It is a context
+# variable so every thread started by ``run_concurrently`` reports to the job
+# that spawned it.
+_progress_listener = contextvars.ContextVar("progress_listener", default=None)
+
+
+def report_progress(stage: str | None = None, tokens: int = 0) -> None:
+    """Report a new stage and/or streamed tokens to the active listener.
+
+    The listener may raise ``GenerationCancelled`` to stop the generation.
+    """
+    listener = _progress_listener.get()
+    if listener is not None:
+        listener(stage, tokens)
+
+
+LLM_MODEL = os.environ.get("LLM_MODEL", "llama3:8b")
+# Model for short structured answers (title and topic lists)
+LLM_SMALL_MODEL = os.environ.get("LLM_SMALL_MODEL", LLM_MODEL)
+
+# Model, generation options and budget for each purpose passed to
+# ``generate_text``: ``max_tokens`` caps the generated tokens, ``deadline`` is
+# the wall-clock limit in seconds and ``stop`` lists stop strings. The
+# LLM_ROUTES environment variable holds JSON that overrides entries, e.g.
+# {"quiz": {"model": "qwen2.5:3b", "options": {"temperature": 0.2}, "deadline": 120}}
+DEFAULT_LLM_ROUTES = {
+    "general": {"model": LLM_MODEL},
+    # Blog posts are creative: a repeated prompt must give a new post
+    "blog": {"model": LLM_MODEL, "max_tokens": 2048, "deadline": 600, "cache": False},
+    "overview": {"model": LLM_MODEL, "max_tokens": 1024, "deadline": 300},
+    "module": {"model": LLM_MODEL, "max_tokens": 2048, "deadline": 600},
+    "quiz": {"model": LLM_MODEL, "max_tokens": 2048, "deadline": 300},
+    "titles": {"model": LLM_SMALL_MODEL, "max_tokens": 256, "deadline": 120},
+    "topics": {"model": LLM_SMALL_MODEL, "max_tokens": 256, "deadline": 120},
+}
+
+
+def load_llm_routes() -> dict:
+    routes = {purpose: dict(route) for purpose, route in DEFAULT_LLM_ROUTES.items()}
+    raw = os.environ.get("LLM_ROUTES")
+    if raw:
+        try:
+            for purpose, route in json.loads(raw).items():
+                routes.setdefault(purpose, {"model": LLM_MODEL}).update(route)
+        except (ValueError, AttributeError) as e:
+            print(f"[WARN] Ignoring invalid LLM_ROUTES: {e}")
+    return routes
+
+
+LLM_ROUTES = load_llm_routes()
+
+
+def get_llm_route(purpose: str) -> dict:
+    """Return the model and options used for ``purpose``."""
+    return LLM_ROUTES.get(purpose) or LLM_ROUTES["general"]
+
+# On-disk cache of model responses. Entries are keyed by model, prompt and
+# generation options so re-running a batch or retrying an admin action reuses
+# answers that were already paid for.
+LLM_CACHE_DIR = os.environ.get(
+    "LLM_CACHE_DIR", os.path.join(app.instance_path, "llm_cache")
+)
+LLM_CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+LLM_CACHE_MAX_AGE = int(os.environ.get("LLM_CACHE_MAX_AGE", 30 * 24 * 3600))
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_DISABLE") != "1"
+# Prune the cache directory every N writes instead of on every write
+LLM_CACHE_PRUNE_EVERY = 50
+
+# Cache hits are counted per purpose in the telemetry table (``cached``)
+_llm_cache_writes = 0
+_llm_cache_lock = threading.Lock()
+
+# Optional process-wide cap on requests in flight to the model, shared by every
+# thread (see ``set_llm_concurrency_limit``)
+_llm_slots: threading.BoundedSemaphore | None = None
+
+
+def set_llm_concurrency_limit(limit: int | None) -> None:
+    """Cap the number of model requests running at once across all threads."""
+    global _llm_slots
+    _llm_slots = threading.BoundedSemaphore(limit) if limit else None
+
+
+def llm_cache_key(model: str, prompt: str, options: dict | None = None) -> str:
+    """Return the cache key for a generation request."""
+    payload = json.dumps(
+        {"model": model, "prompt": prompt, "options": options or {}},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _llm_cache_path(key: str) -> str:
+    return os.path.join(LLM_CACHE_DIR, key[:2], f"{key}.json")
+
+
+def llm_cache_get(key: str) -> str | None:
+    """Return a cached response or ``None`` if missing or expired."""
+    path = _llm_cache_path(key)
+    try:
+        with open(path, encoding="utf-8") as fh:
+            entry = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if time.time() - entry.get("created", 0) > LLM_CACHE_MAX_AGE:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    try:
+        # Touch the file so size-based eviction drops the least recently used
+        os.utime(path)
+    except OSError:
+        pass
+    return entry.get("response")
+
+
+def llm_cache_put(key: str, model: str, response: str) -> None:
+    """Store a response in the cache, pruning it from time to time."""
+    path = _llm_cache_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(
+                {"model": model, "created": time.time(), "response": response},
+                fh,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[WARN] llm_cache_put error: {e}")
+        return
+    global _llm_cache_writes
+    with _llm_cache_lock:
+        _llm_cache_writes += 1
+        prune = _llm_cache_writes % LLM_CACHE_PRUNE_EVERY == 0
+    if prune:
+        prune_llm_cache()
+
+
+def prune_llm_cache() -> int:
+    """Remove expired entries and the least recently used ones over the size cap.
+
+    Returns the number of removed entries.
+    """
+    entries = []
+    now = time.time()
+    removed = 0
+    for root, _dirs, files in os.walk(LLM_CACHE_DIR):
+        for name in files:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if now - st.st_mtime > LLM_CACHE_MAX_AGE:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _mtime, size, _path in entries)
+    entries.sort()
+    for _mtime, size, path in entries:
+        if total <= LLM_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+            total -= size
+        except OSError:
+            pass
+    return removed
+
+
+# Per-call telemetry stored in the ``llm_call`` table. Only the most recent
+# LLM_TELEMETRY_KEEP rows are kept.
+LLM_TELEMETRY_ENABLED = os.environ.get("LLM_TELEMETRY", "1") != "0"
+LLM_TELEMETRY_KEEP = int(os.environ.get("LLM_TELEMETRY_KEEP", "5000"))
+
+
+def record_llm_call(**fields) -> None:
+    """Store the telemetry of one model call, trimming old rows now and then."""
+    if not LLM_TELEMETRY_ENABLED:
+        return
+    table = LLMCall.__table__
+    try:
+        # Calls made from pool threads have no app context of their own
+        with app.app_context(), db.engine.begin() as conn:
+            result = conn.execute(
+                table.insert().values(created_at=datetime.datetime.utcnow(), **fields)
+            )
+            call_id = result.inserted_primary_key[0]
+            if call_id and call_id % 100 == 0:
+                conn.execute(table.delete().where(table.c.id <= call_id - LLM_TELEMETRY_KEEP))
+    except Exception as e:
+        print(f"[WARN] record_llm_call error: {e}")
+
+
+def llm_telemetry_summary() -> list[dict]:
+    """Aggregate the stored calls per purpose, slowest purpose first."""
+    c = LLMCall.__table__.c
+    rows = db.session.execute(
+        db.select(
+            c.purpose,
+            db.func.count(),
+            db.func.sum(db.case((c.cached == True, 1), else_=0)),  # noqa: E712
+            db.func.sum(db.case((c.cached == True, 0), else_=c.wall_ms)),  # noqa: E712
+            db.func.avg(db.case((c.cached == True, None), else_=c.ttft_ms)),  # noqa: E712
+            db.func.sum(c.prompt_tokens),
+            db.func.sum(c.completion_tokens),
+            # ``attempt`` is 0-based: every call after the first is one retry
+            db.func.sum(db.case((c.attempt > 0, 1), else_=0)),
+            db.func.count(c.truncated),
+        ).group_by(c.purpose)
+    ).all()
+    total_ms = sum(row[3] or 0 for row in rows) or 1
+    summary = []
+    for (
+        purpose,
+        calls,
+        hits,
+        wall_ms,
+        ttft_ms,
+        prompt_tokens,
+        completion_tokens,
+        retries,
+        truncated,
+    ) in rows:
+        generated = calls - (hits or 0)
+        wall_ms = wall_ms or 0
+        summary.append(
+            {
+                "purpose": purpose,
+                "calls": calls,
+                "cache_hits": hits or 0,
+                "retries": retries or 0,
+                "truncated": truncated or 0,
+                "avg_wall_s": wall_ms / generated / 1000 if generated else 0,
+                "avg_ttft_s": (ttft_ms or 0) / 1000,
+                "prompt_tokens": prompt_tokens or 0,
+                "completion_tokens": completion_tokens or 0,
+                "tokens_per_s": (completion_tokens or 0) / (wall_ms / 1000) if wall_ms else 0,
+                "total_min": wall_ms / 60000,
+                "share": wall_ms / total_ms,
+            }
+        )
+    summary.sort(key=lambda row: row["total_min"], reverse=True)
+    return summary
+
+
+class GeneratedText(str):
+    """Text returned by ``generate_text``.
+
+    ``truncated`` names the limit that cut the answer short (``max_tokens``,
+    ``deadline`` or ``cancelled``) and is ``None`` for a complete answer.
+    """
+
+    truncated: str | None = None
+
+    def __new__(cls, text: str, truncated: str | None = None):
+        obj = super().__new__(cls, text)
+        obj.truncated = truncated
+        return obj
+
+
+class CourseSession:
+    """Shared prompt prefix for all the generations of one course.
+
+    Calls made through a session share the same system prompt, and the
+    evaluated context of the first call (normally the overview) is handed to
+    the following module and quiz calls, so the course brief is evaluated
+    once per course instead of once per request.
+    """
+
+    def __init__(self, topic: str):
+        self.topic = topic
+        self.system = (
+            f"Eres un diseñador instruccional que escribe un curso en español sobre {topic}. "
+            "Todas tus respuestas pertenecen a este mismo curso, deben ser coherentes entre sí "
+            "y seguir exactamente el formato que se pide en cada solicitud."
+        )
+        self.context: list[int] | None = None
+        # Model that produced ``context``; other models cannot resume from it
+        self.model: str | None = None
+        self._lock = threading.Lock()
+
+    def remember(self, context: list[int] | None, model: str) -> None:
+        """Keep the first evaluated context the backend returns."""
+        if not context:
+            return
+        with self._lock:
+            if self.context is None:
+                self.context = list(context)
+                self.model = model
+
+    def context_for(self, model: str) -> list[int] | None:
+        return self.context if self.model == model else None
+
+
+def generate_text(
+    prompt: str,
+    *,
+    purpose: str = "general",
+    attempt: int = 0,
+    use_cache: bool = True,
+    stop_when=None,
+    session: CourseSession | None = None,
+    max_tokens: int | None = None,
+    deadline: float | None = None,
+    stop: list[str] | None = None,
+    cancel=None,
+) -> GeneratedText:
+    """Generate text with the configured backend (local Llama 3 by default).
+
+    Responses are served from the on-disk cache when possible. Passing
+    ``use_cache=False`` skips the lookup but still stores the fresh answer,
+    which is what retries want. ``stop_when`` is called with the text received
+    so far whenever a JSON value may have been closed; returning ``True`` ends
+    the stream early. ``purpose`` and ``attempt`` tag the call's telemetry.
+    With a ``session`` the call shares the course's system prompt and
+    evaluated context. The model, options and budget come from the route of
+    ``purpose`` (see ``LLM_ROUTES``); ``max_tokens``, ``deadline`` (seconds)
+    and ``stop`` override the route's. ``cancel`` is called while the answer
+    streams and returning ``True`` stops it. When a limit is hit the partial
+    answer is returned with ``truncated`` set and is not cached. Routes with
+    ``"cache": false`` never read or write the cache.
+    """
+    backend = get_backend()
+    route = get_llm_route(purpose)
+    model = route["model"]
+    cacheable = LLM_CACHE_ENABLED and route.get("cache", True)
+    options = dict(route.get("options") or {})
+    max_tokens = max_tokens or route.get("max_tokens")
+    if max_tokens:
+        options["num_predict"] = max_tokens
+    stop = stop or route.get("stop")
+    if stop:
+        options["stop"] = list(stop)
+    deadline = deadline or route.get("deadline")
+    context = session.context_for(model) if session else None
+    cache_options = dict(options)
+    if session:
+        # The answer depends on the shared prefix, so it is part of the key
+        cache_options["session"] = hashlib.sha256(
+            json.dumps([session.system, context]).encode("utf-8")
+        ).hexdigest()
+    key = llm_cache_key(f"{backend.name}/{model}", prompt, cache_options)
+    telemetry = {
+        "purpose": purpose,
+        "backend": backend.name,
+        "model": model,
+        "attempt": attempt,
+    }
+    started = time.perf_counter()
+    expires = started + deadline if deadline else None
+    if cacheable and use_cache:
+        cached = llm_cache_get(key)
+        if cached is not None:
+            record_llm_call(
+                cached=True, wall_ms=int((time.perf_counter() - started) * 1000), **telemetry
+            )
+            return GeneratedText(cached)
+    slots = _llm_slots
+    if slots and not slots.acquire(
+        timeout=max(0, expires - time.perf_counter()) if expires else None
+    ):
+        print(f"[WARN] {purpose} generation waited past its {deadline}s deadline")
+        record_llm_call(
+            cached=False,
+            wall_ms=int((time.perf_counter() - started) * 1000),
+            truncated="deadline",
+            **telemetry,
+        )
+        return GeneratedText("", truncated="deadline")
+    stream = None
+    first_token_at = None
+    prompt_tokens = completion_tokens = None
+    truncated = None
+    chunks = 0
+    parts = []
+    try:
+        report_progress()
+        started = time.perf_counter()
+        # Backends that take a timeout give up when the deadline passes, even
+        # while the server is still loading the model or has stopped answering
+        timeout = max(0.1, expires - started) if expires else None
+        if session:
+            stream = backend.generate(
+                model,
+                prompt,
+                system=session.system,
+                context=context,
+                options=options,
+                timeout=timeout,
+            )
+        else:
+            stream = backend.chat(
+                model, [{"role": "user", "content": prompt}], options, timeout=timeout
+            )
+        for chunk in stream:
+            content = chunk["content"]
+            if content and first_token_at is None:
+                first_token_at = time.perf_counter()
+            if chunk.get("done"):
+                prompt_tokens = chunk.get("prompt_eval_count")
+                completion_tokens = chunk.get("eval_count")
+                if session:
+                    session.remember(chunk.get("context"), model)
+                if chunk.get("done_reason") == "length" or (
+                    max_tokens and (completion_tokens or 0) >= max_tokens
+                ):
+                    truncated = "max_tokens"
+            parts.append(content)
+            chunks += 1
+            # Ollama streams roughly one token per chunk
+            report_progress(tokens=1)
+            if stop_when and any(c in content for c in '"}]') and stop_when("".join(parts)):
+                break
+            if chunk.get("done"):
+                continue
+            if expires and time.perf_counter() > expires:
+                truncated = "deadline"
+                break
+            if cancel and cancel():
+                truncated = "cancelled"
+                break
+    except Exception:
+        if not expires or time.perf_counter() < expires:
+            raise
+        # The client timed out at the deadline
+        truncated = "deadline"
+    finally:
+        # Closing the stream drops the connection so a cancelled request stops
+        # consuming inference time on the server
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+        if slots:
+            slots.release()
+    response = "".join(parts)
+    finished = time.perf_counter()
+    record_llm_call(
+        cached=False,
+        wall_ms=int((finished - started) * 1000),
+        ttft_ms=int((first_token_at - started) * 1000) if first_token_at else None,
+        prompt_tokens=prompt_tokens,
+        # A stream stopped early never reports eval_count
+        completion_tokens=completion_tokens or chunks,
+        truncated=truncated,
+        **telemetry,
     )
-    return "".join(chunk["message"]["content"] for chunk in stream)
+    if truncated:
+        print(f"[WARN] {purpose} generation truncated ({truncated}) after {chunks} chunks")
+    elif cacheable and response.strip():
+        llm_cache_put(key, model, response)
+    return GeneratedText(response, truncated=truncated)
+
+
+def warm_up_llm() -> None:
+    """Load every routed model before a pipeline starts so the first step
+    does not pay the load time."""
+    for model in sorted({route["model"] for route in LLM_ROUTES.values()}):
+        started = time.perf_counter()
+        try:
+            get_backend().warm_up(model)
+            print(f"Model {model} ready in {time.perf_counter() - started:.1f}s")
+        except Exception as e:
+            print(f"[WARN] warm_up_llm error for {model}: {e}")
+
+
+# Default number of simultaneous requests sent to the model when generating a
+# course. Ollama queues requests beyond its own ``OLLAMA_NUM_PARALLEL`` setting.
+LLM_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", "1"))
+# Generate each course through a CourseSession that reuses the evaluated
+# prompt prefix (see ``create_course``)
+LLM_COURSE_SESSION = os.environ.get("LLM_COURSE_SESSION") == "1"
+
+
+def run_concurrently(func, items, concurrency: int | None = None) -> list:
+    """Apply ``func`` to every item with at most ``concurrency`` calls in flight.
+
+    Results are returned in the same order as ``items``.
+    """
+    items = list(items)
+    workers = max(1, min(concurrency or LLM_CONCURRENCY, len(items) or 1))
+    if workers == 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Each task runs in a copy of the caller's context so progress
+        # listeners follow the work into the pool threads
+        futures = [
+            pool.submit(contextvars.copy_context().run, func, item) for item in items
+        ]
+        return [future.result() for future in futures]
 
 
 # Default feed for the news section. Individual deployments can override this
@@ -412,16 +1387,61 @@ def get_news_api_url():
     return f"https://newsdata.io/api/1/news?language=es&category=business&apikey={api_key}"
 
 
-def generate_blog_post() -> tuple[str, str]:
-    """Create a blog post and return a ``(title, content)`` tuple."""
+# Minimum word overlap (Jaccard) for two headlines to be the same story
+NEWS_DUPLICATE_THRESHOLD = float(os.environ.get("NEWS_DUPLICATE_THRESHOLD", "0.6"))
+# Blog posts from this many days back count as already covered topics
+BLOG_COVERED_DAYS = int(os.environ.get("BLOG_COVERED_DAYS", "90"))
+
+
+def covered_topics_index() -> MinHashIndex:
+    """Index the titles and source headlines of recent blog posts."""
+    since = datetime.datetime.utcnow() - datetime.timedelta(days=BLOG_COVERED_DAYS)
+    index = MinHashIndex(NEWS_DUPLICATE_THRESHOLD)
+    rows = db.session.execute(
+        db.select(BlogPost.id, BlogPost.title, BlogPost.source_title).where(
+            BlogPost.created_at >= since
+        )
+    ).all()
+    for post_id, title, source_title in rows:
+        index.add(post_id, title)
+        if source_title:
+            index.add(post_id, source_title)
+    return index
+
+
+def pick_news_topic(items: list) -> str | None:
+    """Return a random headline from ``items`` that no recent post covered."""
+    try:
+        covered = covered_topics_index()
+    except Exception as e:
+        print(f"[WARN] covered_topics_index error: {e}")
+        covered = MinHashIndex(NEWS_DUPLICATE_THRESHOLD)
+    items = [item for item in items if isinstance(item, dict) and item.get("title")]
+    random.shuffle(items)
+    skipped = 0
+    for item in items:
+        if covered.find(item["title"]) is None:
+            if skipped:
+                print(f"Skipped {skipped} headline(s) already covered by recent posts")
+            return item["title"]
+        skipped += 1
+    if skipped:
+        print(f"All {skipped} headline(s) are already covered by recent posts")
+    return None
+
+
+def generate_blog_post() -> tuple[str, str, str | None]:
+    """Create a blog post and return a ``(title, content, source_title)``
+    tuple, where ``source_title`` is the news headline it is based on."""
     topic = None
+    report_progress("Buscando noticias")
     news_api = get_setting("news_api_url") or get_news_api_url()
     try:
+        import requests
+
         resp = requests.get(news_api, timeout=10)
         resp.raise_for_status()
-        items = resp.json().get("results", [])
-        if items:
-            topic = random.choice(items).get("title")
+        topic = pick_news_topic(resp.json().get("results", []))
     except Exception:
         topic = None
 
@@ -439,13 +1459,14 @@ def generate_blog_post() -> tuple[str, str]:
             f"Incluye la fecha de hoy ({date}) en el texto y no menciones el día de la semana. "
             "Comienza con un título conciso en la primera línea, seguido de un salto de línea y luego el cuerpo."
         )
-    response = generate_text(prompt).strip()
+    report_progress("Escribiendo entrada")
+    response = generate_text(prompt, purpose="blog", use_cache=False).strip()
     lines = response.split("\n", 1)
     title = lines[0].strip()
     # Limpiar markdown del título
     title = title.replace("**", "").replace("##", "").replace("#", "").strip()
     content = lines[1].strip() if len(lines) > 1 else ""
-    return title, content
+    return title, content, topic
 
 
 def parse_json_response(text: str):
@@ -479,7 +1500,193 @@ def parse_json_response(text: str):
     return None
 
 
+_json_decoder = json.JSONDecoder()
+
+
+def _skip_json_value(text: str, pos: int) -> int | None:
+    """Return the end of the JSON-looking value at ``pos``.
+
+    Brackets are balanced while honouring strings. ``None`` means the value is
+    truncated.
+    """
+    opener = text[pos]
+    if opener == '"':
+        i = pos + 1
+        while i < len(text):
+            if text[i] == "\\":
+                i += 2
+                continue
+            if text[i] == '"':
+                return i + 1
+            i += 1
+        return None
+    if opener not in "[{":
+        match = re.compile(r"[,\]\n]").search(text, pos)
+        return match.start() if match else None
+    depth = 0
+    in_string = False
+    i = pos
+    while i < len(text):
+        char = text[i]
+        if in_string:
+            if char == "\\":
+                i += 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "[{":
+            depth += 1
+        elif char in "]}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return None
+
+
+def _nested_list_start(text: str, pos: int) -> int | None:
+    """Return the position after the ``[`` opening the first list value of the
+    object at ``pos``, or ``None`` when it has none before the text ends."""
+    key = re.compile(r'\s*"(?:[^"\\]|\\.)*"\s*:\s*')
+    separator = re.compile(r"\s*,")
+    i = pos + 1
+    while True:
+        match = key.match(text, i)
+        if not match or match.end() >= len(text):
+            return None
+        i = match.end()
+        if text[i] == "[":
+            return i + 1
+        end = _skip_json_value(text, i)
+        match = separator.match(text, end) if end is not None else None
+        if not match:
+            return None
+        i = match.end()
+
+
+def _repair_json_value(snippet: str):
+    """Parse a value with the mistakes models commonly make, or return None."""
+    snippet = re.sub(r",\s*([}\]])", r"\1", snippet)
+    try:
+        return json.loads(snippet)
+    except ValueError:
+        return None
+
+
+def iter_json_items(text: str):
+    """Yield every complete element of the first JSON list found in ``text``.
+
+    Parsing is incremental and tolerant: an element that fails to decode is
+    skipped and a truncated trailing element ends the iteration, so partial or
+    partly broken output still yields each complete item. A bare sequence of
+    objects without the enclosing list is accepted too, and so is a list
+    wrapped in an object such as ``{"questions": [...]}``, even truncated.
+    """
+    match = re.search(r"[\[{]", text)
+    if not match:
+        return
+    pos = match.start()
+    if text[pos] == "[":
+        pos += 1
+    elif _skip_json_value(text, pos) is None:
+        # A truncated wrapper object: read the items of its first list
+        pos = _nested_list_start(text, pos) or pos
+    n = len(text)
+    while pos < n:
+        while pos < n and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= n or text[pos] in "]`":
+            return
+        try:
+            item, end = _json_decoder.raw_decode(text, pos)
+        except ValueError:
+            end = _skip_json_value(text, pos)
+            if end is None:
+                return
+            item = _repair_json_value(text[pos:end])
+            if item is None:
+                pos = end
+                continue
+        if isinstance(item, dict) and pos == match.start():
+            # A wrapper object such as {"questions": [...]}
+            nested = next((v for v in item.values() if isinstance(v, list)), None)
+            if nested is not None:
+                yield from nested
+                return
+        yield item
+        pos = end
+
+
+def generate_json_items(
+    build_prompt,
+    count: int,
+    clean,
+    *,
+    purpose: str,
+    attempts: int = 3,
+    session: CourseSession | None = None,
+) -> list:
+    """Collect ``count`` valid items from JSON list answers.
+
+    ``build_prompt(missing, items)`` returns the prompt asking for ``missing``
+    more items given those already collected, and ``clean(item)`` returns the
+    normalised item or ``None`` when it is unusable. The stream is stopped as
+    soon as enough valid items arrived, and retries only ask for the items
+    still missing.
+    """
+    items = []
+    for attempt in range(attempts):
+        missing = count - len(items)
+        if missing <= 0:
+            break
+
+        def valid_items(text):
+            return [c for c in map(clean, iter_json_items(text)) if c is not None]
+
+        text = generate_text(
+            build_prompt(missing, items),
+            purpose=purpose,
+            attempt=attempt,
+            session=session,
+            # A cached answer that came up short would do so again
+            use_cache=attempt == 0,
+            stop_when=lambda text, missing=missing: len(valid_items(text)) >= missing,
+        )
+        for item in valid_items(text):
+            if item not in items:
+                items.append(item)
+    return items[:count]
+
+
+def _clean_title(item) -> str | None:
+    if isinstance(item, (str, int, float)) and str(item).strip():
+        return str(item).strip()
+    return None
+
+
+def _clean_question(item) -> dict | None:
+    if not isinstance(item, dict):
+        return None
+    item = {str(k).strip().lower(): v for k, v in item.items()}
+    question = str(item.get("question") or "").strip()
+    answer = str(item.get("answer") or "").strip().upper()[:1]
+    if not question or answer not in ("A", "B", "C", "D"):
+        return None
+    return {
+        "question": question,
+        "a": str(item.get("a") or ""),
+        "b": str(item.get("b") or ""),
+        "c": str(item.get("c") or ""),
+        "d": str(item.get("d") or ""),
+        "answer": answer,
+    }
+
+
 def generate_certificate_pdf(name: str, course: str, score: int) -> bytes:
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
     buffer = BytesIO()
     c = canvas.Canvas(buffer, pagesize=letter)
     c.setFont("Helvetica-Bold", 24)
@@ -498,6 +1705,9 @@ def generate_certificate_pdf(name: str, course: str, score: int) -> bytes:
 def send_email(
     to_addr: str, subject: str, body: str, attachment: bytes | None = None
 ) -> None:
+    import smtplib
+    from email.message import EmailMessage
+
     msg = EmailMessage()
     sender = get_setting("admin_email") or os.environ.get("ADMIN_EMAIL")
     if not sender:
@@ -548,22 +1758,39 @@ def clean_module_content(html: str, title: str) -> str:
     return html.strip()
 
 
-def generate_section_titles(topic: str, count: int = 3):
-    """Return a list of module titles for the course."""
+def section_titles_prompt(topic: str, count: int, titles=()) -> str:
     prompt = (
         f"Proporciona {count} títulos concisos de módulos para un curso sobre {topic}. "
         "Responde en JSON como una lista simple de cadenas. La respuesta debe estar en español."
     )
-    data = parse_json_response(generate_text(prompt)) or []
-    titles = [str(t) for t in data][:count]
-    if not titles:
-        titles = [f"Module {i}" for i in range(1, count + 1)]
+    if titles:
+        prompt += " No repitas estos títulos: " + json.dumps(titles, ensure_ascii=False)
+    return prompt
+
+
+def generate_section_titles(
+    topic: str, count: int = 3, *, session: CourseSession | None = None, pad: bool = True
+):
+    """Return a list of module titles for the course.
+
+    Missing titles are filled with "Module N" placeholders unless ``pad`` is
+    false.
+    """
+    titles = generate_json_items(
+        lambda missing, titles: section_titles_prompt(topic, missing, titles),
+        count,
+        _clean_title,
+        purpose="titles",
+        attempts=2,
+        session=session,
+    )
+    if pad:
+        titles += [f"Module {i}" for i in range(len(titles) + 1, count + 1)]
     return titles
 
 
-def generate_module_content(course_topic: str, module_title: str) -> str:
-    """Generate detailed HTML content for a single module."""
-    prompt = (
+def module_prompt(course_topic: str, module_title: str) -> str:
+    return (
         f"Escribe una lección para un curso sobre {course_topic}. "
         f"El título del módulo es '{module_title}'. "
         "La respuesta debe estar en HTML usando una estructura consistente: "
@@ -571,13 +1798,19 @@ def generate_module_content(course_topic: str, module_title: str) -> str:
         "una sección titulada 'Contenido principal' que cubra el tema, y una sección final titulada 'Conclusión' que resuma los puntos clave. "
         "No hagas referencia a otros módulos y responde solo con el marcado HTML. La respuesta debe estar en español."
     )
-    content = generate_text(prompt).strip()
+
+
+def generate_module_content(
+    course_topic: str, module_title: str, *, session: CourseSession | None = None
+) -> str:
+    """Generate detailed HTML content for a single module."""
+    prompt = module_prompt(course_topic, module_title)
+    content = generate_text(prompt, purpose="module", session=session).strip()
     return clean_module_content(content, module_title)
 
 
-def generate_course_overview(topic: str) -> str:
-    """Return an HTML overview for the course."""
-    prompt = (
+def overview_prompt(topic: str) -> str:
+    return (
         f"Escribe una descripción concisa para un curso sobre {topic}. "
         "La respuesta debe estar en HTML con tres secciones: "
         "<h2>Introducción</h2> describiendo el curso, "
@@ -585,77 +1818,168 @@ def generate_course_overview(topic: str) -> str:
         "<h2>Expectativas de aprendizaje</h2> resumiendo los resultados. "
         "No menciones cuántos módulos tiene el curso. La respuesta debe estar en español."
     )
-    return generate_text(prompt).strip()
 
 
-def generate_course_sections(topic: str, count: int = 3):
-    """Return a list of section dicts with title and content."""
+def generate_course_overview(topic: str, *, session: CourseSession | None = None) -> str:
+    """Return an HTML overview for the course."""
+    prompt = overview_prompt(topic)
+    return generate_text(prompt, purpose="overview", session=session).strip()
+
+
+def generate_course_sections(
+    topic: str, count: int = 3, *, concurrency: int | None = None
+):
+    """Return a list of section dicts with title and content.
+
+    Up to ``concurrency`` modules are generated at the same time.
+    """
     titles = generate_section_titles(topic, count)
-    sections = []
-    for i, title in enumerate(titles, 1):
-        content = generate_module_content(topic, title)
-        sections.append({"title": title, "content": content, "order": i})
-    return sections
+    contents = run_concurrently(
+        lambda title: generate_module_content(topic, title), titles, concurrency
+    )
+    return [
+        {"title": title, "content": content, "order": i}
+        for i, (title, content) in enumerate(zip(titles, contents), 1)
+    ]
 
 
-def generate_quiz_questions(topic: str, count: int = 10):
-    """Return a list of quiz question dicts."""
+def quiz_prompt(topic: str, count: int, questions=()) -> str:
     prompt = (
         f"Crea {count} preguntas tipo test de opción múltiple que resuman los puntos clave sobre {topic}. "
         "Proporciona las opciones A, B, C y D y la letra de la respuesta correcta. "
         "Responde solo con JSON válido. El JSON debe ser una lista de objetos, cada uno con "
         "'question', 'a', 'b', 'c', 'd' y 'answer'. No incluyas ninguna explicación ni formato fuera del JSON. La respuesta debe estar en español."
     )
-    data = None
-    for _ in range(3):
-        data = parse_json_response(generate_text(prompt))
-        if data:
-            break
-    if not data:
-        return []
-    questions = []
-    for i, item in enumerate(data, 1):
-        questions.append(
-            {
-                "question": item.get("question", ""),
-                "a": item.get("a", ""),
-                "b": item.get("b", ""),
-                "c": item.get("c", ""),
-                "d": item.get("d", ""),
-                "answer": item.get("answer", "").strip().upper(),
-                "order": i,
-            }
-        )
+    if questions:
+        asked = [q["question"] for q in questions]
+        prompt += " No repitas estas preguntas: " + json.dumps(asked, ensure_ascii=False)
+    return prompt
+
+
+def generate_quiz_questions(
+    topic: str, count: int = 10, *, session: CourseSession | None = None
+):
+    """Return a list of quiz question dicts.
+
+    Valid questions are salvaged from incomplete answers and only the missing
+    ones are requested again.
+    """
+    questions = generate_json_items(
+        lambda missing, questions: quiz_prompt(topic, missing, questions),
+        count,
+        _clean_question,
+        purpose="quiz",
+        session=session,
+    )
+    for i, question in enumerate(questions, 1):
+        question["order"] = i
     return questions
 
 
-def generate_course_topics(topic: str, count: int = 3) -> list[str]:
-    """Return a list of course titles related to ``topic``."""
+def course_topics_prompt(topic: str, count: int, titles=()) -> str:
     prompt = (
         f"Provide {count} concise course titles related to {topic}. "
         "Respond in JSON as a simple list of strings."
     )
-    data = parse_json_response(generate_text(prompt)) or []
-    titles = [str(t) for t in data][:count]
-    if not titles:
-        titles = [f"{topic} Course {i}" for i in range(1, count + 1)]
-    return titles
+    if titles:
+        prompt += " Do not repeat these titles: " + json.dumps(titles, ensure_ascii=False)
+    return prompt
+
+
+def generate_course_topics(topic: str, count: int = 3) -> list[str]:
+    """Return a list of course titles related to ``topic``."""
+    titles = generate_json_items(
+        lambda missing, titles: course_topics_prompt(topic, missing, titles),
+        count,
+        _clean_title,
+        purpose="topics",
+        attempts=2,
+    )
+    titles += [f"{topic} Course {i}" for i in range(len(titles) + 1, count + 1)]
+    return titles
+
+
+def create_course(
+    title: str,
+    *,
+    module_count: int = 3,
+    difficulty: str = "Beginner",
+    prerequisites: str = "",
+    description: str | None = None,
+    icon: str | None = None,
+    company_id: int | None = None,
+    price_cents: int = 0,
+    concurrency: int | None = None,
+    use_session: bool | None = None,
+) -> Course:
+    """Create a course with modules and quiz questions.
+
+    The overview, every module and the quiz are independent requests, so with
+    ``concurrency`` above one they are sent to the model together.
+
+    With ``use_session`` (default ``LLM_COURSE_SESSION``) every request goes
+    through one ``CourseSession``: the overview is generated first and its
+    evaluated context is reused by the titles, modules and quiz.
+    """
+    if use_session is None:
+        use_session = LLM_COURSE_SESSION
+    session = CourseSession(title) if use_session else None
+    if session and not description:
+        report_progress("Generando descripción")
+        description = generate_course_overview(title, session=session)
+    report_progress("Generando títulos de módulos")
+    titles = generate_section_titles(title, module_count, session=session)
+    jobs = [
+        lambda t=t: generate_module_content(title, t, session=session) for t in titles
+    ]
+    jobs.append(lambda: generate_quiz_questions(title, 10, session=session))
+    if not description:
+        jobs.append(lambda: generate_course_overview(title))
+    finished = []
+
+    def run_part(job):
+        result = job()
+        finished.append(job)
+        report_progress(f"Partes completadas: {len(finished)}/{len(jobs)}")
+        return result
+
+    report_progress(f"Generando {len(titles)} módulos, examen y descripción")
+    results = run_concurrently(run_part, jobs, concurrency)
+    report_progress("Guardando curso")
+    contents = results[: len(titles)]
+    quiz = results[len(titles)]
+    if not description:
+        description = results[-1]
+    sections = [
+        {"title": section_title, "content": content, "order": i}
+        for i, (section_title, content) in enumerate(zip(titles, contents), 1)
+    ]
+    return save_course(
+        title,
+        description=description,
+        sections=sections,
+        questions=quiz,
+        difficulty=difficulty,
+        prerequisites=prerequisites,
+        icon=icon,
+        company_id=company_id,
+        price_cents=price_cents,
+    )
 
 
-def create_course(
+def save_course(
     title: str,
     *,
-    module_count: int = 3,
+    description: str,
+    sections: list[dict],
+    questions: list[dict],
     difficulty: str = "Beginner",
     prerequisites: str = "",
-    description: str | None = None,
     icon: str | None = None,
     company_id: int | None = None,
     price_cents: int = 0,
 ) -> Course:
-    """Create a course with modules and quiz questions."""
-    if not description:
-        description = generate_course_overview(title)
+    """Store an already generated course with its sections and quiz."""
     course = Course(
         title=title,
         description=description,
@@ -665,19 +1989,21 @@ def create_course(
         company_id=company_id,
         price_cents=price_cents,
     )
+    store_rendered_html(course, "description")
     db.session.add(course)
     db.session.commit()
 
-    for sec in generate_course_sections(title, module_count):
+    for sec in sections:
         section = CourseSection(
             course_id=course.id,
             title=sec["title"],
             content=sec["content"],
             order=sec["order"],
         )
+        store_rendered_html(section)
         db.session.add(section)
 
-    for q in generate_quiz_questions(title, 10):
+    for q in questions:
         question = QuizQuestion(
             course_id=course.id,
             question=q["question"],
@@ -693,10 +2019,15 @@ def create_course(
     return course
 
 
-def fetch_news_items() -> None:
-    """Fetch latest news from the API and store new items."""
+def fetch_news_items() -> bool:
+    """Fetch latest news from the API and store new items.
+
+    Returns ``False`` when the fetch failed; the error is logged.
+    """
     news_api = get_setting("news_api_url") or get_news_api_url()
     try:
+        import requests
+
         resp = requests.get(news_api, timeout=10)
         resp.raise_for_status()
         data = resp.json()
@@ -709,6 +2040,26 @@ def fetch_news_items() -> None:
             items = data
         else:
             items = []
+        existing = NewsItem.query.order_by(NewsItem.created_at, NewsItem.id).all()
+        urls = set()
+        titles = MinHashIndex(NEWS_DUPLICATE_THRESHOLD)
+        summaries = MinHashIndex(NEWS_DUPLICATE_THRESHOLD)
+
+        def is_duplicate(title, summary):
+            # Short excerpts share too many stock words to compare
+            return titles.find(title) is not None or (
+                len(summary) >= 80 and summaries.find(summary) is not None
+            )
+
+        # Collapse near duplicates already stored, keeping the oldest row
+        for news in existing:
+            if news.url in urls or is_duplicate(news.title, news.summary):
+                db.session.delete(news)
+                continue
+            urls.add(news.url)
+            titles.add(news.id, news.title)
+            summaries.add(news.id, news.summary)
+        skipped = 0
         for item in items:
             if isinstance(item, dict):
                 title = item.get("title")
@@ -721,9 +2072,16 @@ def fetch_news_items() -> None:
                 summary = summary or item.get("description", "")
                 if summary is None:
                     summary = ""
-                if not NewsItem.query.filter_by(url=url).first():
-                    db.session.add(NewsItem(title=title or "", url=url or "", summary=summary, created_at=datetime.datetime.utcnow()))
+                if url in urls or is_duplicate(title or "", summary):
+                    skipped += 1
+                    continue
+                urls.add(url)
+                titles.add(url, title or "")
+                summaries.add(url, summary)
+                db.session.add(NewsItem(title=title or "", url=url or "", summary=summary, created_at=datetime.datetime.utcnow()))
         db.session.commit()
+        if skipped:
+            print(f"Skipped {skipped} duplicate news item(s)")
         # Keep only the 25 most recent items
         old_items = NewsItem.query.order_by(NewsItem.created_at.desc()).offset(25).all()
         for item in old_items:
@@ -731,100 +2089,432 @@ def fetch_news_items() -> None:
         if old_items:
             db.session.commit()
         set_setting("last_news_fetch", datetime.datetime.utcnow().isoformat())
+        return True
     except Exception as e:
         # Loguea el error pero no detiene el flujo
         print(f"[WARN] fetch_news_items error: {e}")
+        db.session.rollback()
+        return False
 
 
-def create_tables():
-    """Create database tables if they don't exist."""
+# Background jobs. Admin actions that call the model are queued in the ``job``
+# table and executed by ``worker.py`` so the web process answers immediately.
+# JOB_MAX_RUNNING caps how many jobs run at once across all workers.
+JOB_MAX_RUNNING = int(os.environ.get("JOB_MAX_RUNNING", "1"))
+# Jobs still marked as running after this many seconds belong to a dead worker
+JOB_STALE_AFTER = int(os.environ.get("JOB_STALE_AFTER", 6 * 3600))
+# A progress stream ends after this many seconds and the browser reconnects,
+# so an open jobs page never holds a web worker for long
+JOB_EVENTS_MAX_SECONDS = int(os.environ.get("JOB_EVENTS_MAX_SECONDS", "60"))
+
+job_handlers = {}
+
+
+def job_handler(kind: str):
+    """Register a function as the handler for jobs of ``kind``."""
+    def register(func):
+        job_handlers[kind] = func
+        return func
+    return register
+
+
+def enqueue_job(kind: str, **payload) -> Job:
+    """Queue a job for the background worker and return it."""
+    if kind not in job_handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = Job(kind=kind, payload=json.dumps(payload))
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def claim_next_job() -> Job | None:
+    """Mark the oldest queued job as running and return it.
+
+    Returns ``None`` when the queue is empty or ``JOB_MAX_RUNNING`` jobs are
+    already running.
+    """
+    job = Job.query.filter_by(status="queued").order_by(Job.id).first()
+    if job is None:
+        return None
+    # The cap is part of the conditional update, so concurrent workers cannot
+    # all pass a separate check; only one of them wins a given job. The count
+    # reads a derived table because MySQL rejects a subquery on the table
+    # being updated.
+    running = db.aliased(Job)
+    running_count = (
+        db.select(db.func.count())
+        .select_from(db.select(running.id).where(running.status == "running").subquery())
+        .scalar_subquery()
+    )
+    claimed = Job.query.filter(
+        Job.id == job.id, Job.status == "queued", running_count < JOB_MAX_RUNNING
+    ).update(
+        {"status": "running", "started_at": datetime.datetime.utcnow()},
+        synchronize_session=False,
+    )
+    db.session.commit()
+    if not claimed:
+        return None
+    db.session.refresh(job)
+    return job
+
+
+class JobProgress:
+    """Progress listener that mirrors a running job's stage and token count
+    into its row and stops the job once the admin cancels it."""
+
+    # Seconds between database writes for token updates
+    FLUSH_EVERY = 1.0
+
+    def __init__(self, job: Job):
+        self.job_id = job.id
+        # Pool threads have no app context, so keep the engine itself
+        self.engine = db.engine
+        self.stage = None
+        self.tokens = 0
+        self.cancelled = False
+        self._flushed_at = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, stage: str | None = None, tokens: int = 0) -> None:
+        with self._lock:
+            if stage:
+                self.stage = stage[:200]
+            self.tokens += tokens
+            if stage or time.monotonic() - self._flushed_at >= self.FLUSH_EVERY:
+                self.flush()
+            if self.cancelled:
+                raise GenerationCancelled(f"Job {self.job_id} cancelled")
+
+    def flush(self) -> None:
+        self._flushed_at = time.monotonic()
+        table = Job.__table__
+        with self.engine.begin() as conn:
+            conn.execute(
+                table.update()
+                .where(table.c.id == self.job_id)
+                .values(stage=self.stage, tokens=self.tokens)
+            )
+            cancel = conn.execute(
+                db.select(table.c.cancel_requested).where(table.c.id == self.job_id)
+            ).scalar()
+        self.cancelled = bool(cancel)
+
+
+def run_job(job: Job) -> None:
+    """Execute a claimed job and record its result or error."""
+    progress = JobProgress(job)
+    token = _progress_listener.set(progress)
     try:
-        db.create_all()
-        # Ensure uploads folder exists
-        os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
-        # Add icon column to Course if missing
-        inspector = inspect(db.engine)
-        cols = [c["name"] for c in inspector.get_columns("course")]
-        if "icon" not in cols:
-            with db.engine.begin() as conn:
-                conn.execute(text("ALTER TABLE course ADD COLUMN icon VARCHAR(200)"))
-        if "company_id" not in cols:
-            with db.engine.begin() as conn:
-                conn.execute(
-                    text("ALTER TABLE course ADD COLUMN company_id INTEGER REFERENCES company(id)")
-                )
-        if "price_cents" not in cols:
-            with db.engine.begin() as conn:
-                conn.execute(text("ALTER TABLE course ADD COLUMN price_cents INTEGER DEFAULT 0"))
-        user_cols = [c["name"] for c in inspector.get_columns("user")]
-        if "is_company_admin" not in user_cols:
+        handler = job_handlers[job.kind]
+        result = handler(**json.loads(job.payload or "{}"))
+        job.status = "done"
+        job.result = json.dumps(result) if result is not None else None
+    except GenerationCancelled:
+        db.session.rollback()
+        job.status = "cancelled"
+    except Exception as e:
+        db.session.rollback()
+        print(f"[WARN] job {job.id} ({job.kind}) failed: {e}")
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        _progress_listener.reset(token)
+    job.stage = progress.stage
+    job.tokens = progress.tokens
+    job.finished_at = datetime.datetime.utcnow()
+    db.session.commit()
+
+
+def cancel_job(job: Job) -> None:
+    """Cancel a queued job or ask the worker to stop a running one."""
+    if job.status == "queued":
+        job.status = "cancelled"
+        job.finished_at = datetime.datetime.utcnow()
+        if job.kind == "import_users":
+            # Its handler, which deletes the uploaded file, will not run
+            path = json.loads(job.payload)["path"]
+            if os.path.exists(path):
+                os.remove(path)
+    elif job.status == "running":
+        job.cancel_requested = True
+    db.session.commit()
+
+
+def requeue_stale_jobs() -> int:
+    """Put jobs abandoned by a crashed worker back in the queue."""
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=JOB_STALE_AFTER)
+    count = Job.query.filter(Job.status == "running", Job.started_at < cutoff).update(
+        {"status": "queued", "started_at": None}, synchronize_session=False
+    )
+    db.session.commit()
+    return count
+
+
+@job_handler("blog")
+def blog_job() -> dict:
+    title, content, source_title = generate_blog_post()
+    post = BlogPost(title=title, content=content, source_title=source_title)
+    store_rendered_html(post)
+    db.session.add(post)
+    db.session.commit()
+    refresh_blog_archive_months()
+    return {"post_id": post.id, "title": title}
+
+
+@job_handler("course")
+def course_job(topic: str, **options) -> dict:
+    course = create_course(topic, **options)
+    return {"course_id": course.id, "title": course.title}
+
+
+@job_handler("generate_questions")
+def generate_questions_job(course_id: int) -> dict:
+    course = db.session.get(Course, course_id)
+    if course is None:
+        raise ValueError(f"Course {course_id} no longer exists")
+    questions = generate_quiz_questions(course.title, 10)
+    QuizQuestion.query.filter_by(course_id=course.id).delete()
+    for q in questions:
+        question = QuizQuestion(
+            course_id=course.id,
+            question=q["question"],
+            option_a=q["a"],
+            option_b=q["b"],
+            option_c=q["c"],
+            option_d=q["d"],
+            answer=q["answer"],
+            order=q["order"],
+        )
+        db.session.add(question)
+    db.session.commit()
+    return {"course_id": course.id, "questions": len(questions)}
+
+
+@job_handler("fetch_news")
+def fetch_news_job() -> None:
+    if not fetch_news_items():
+        raise RuntimeError("News fetch failed")
+
+
+class SchemaVersion(db.Model):
+    """Number of the last migration applied to the database (a single row)."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+
+# Changes to existing databases, applied in order by ``create_tables``. Each
+# runs once and the number of the last one applied is stored in
+# ``schema_version``; append new migrations and never renumber old ones. New
+# tables only need their model, since ``db.create_all`` runs whenever a
+# migration is pending.
+migrations = []
+
+
+def migration(version: int):
+    def register(func):
+        assert version == len(migrations) + 1, f"migration {version} is out of order"
+        migrations.append(func)
+        return func
+    return register
+
+
+@migration(1)
+def add_missing_columns() -> None:
+    """Columns added to tables after they were first created."""
+    inspector = inspect(db.engine)
+    # Add icon column to Course if missing
+    cols = [c["name"] for c in inspector.get_columns("course")]
+    if "icon" not in cols:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE course ADD COLUMN icon VARCHAR(200)"))
+    if "company_id" not in cols:
+        with db.engine.begin() as conn:
+            conn.execute(
+                text("ALTER TABLE course ADD COLUMN company_id INTEGER REFERENCES company(id)")
+            )
+    if "price_cents" not in cols:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE course ADD COLUMN price_cents INTEGER DEFAULT 0"))
+    user_cols = [c["name"] for c in inspector.get_columns("user")]
+    if "is_company_admin" not in user_cols:
+        with db.engine.begin() as conn:
+            conn.execute(
+                text("ALTER TABLE user ADD COLUMN is_company_admin BOOLEAN DEFAULT 0")
+            )
+    if "reset_token" not in user_cols:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE user ADD COLUMN reset_token VARCHAR(200)"))
+    if "reset_token_expires" not in user_cols:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE user ADD COLUMN reset_token_expires DATETIME"))
+
+    blog_cols = [c["name"] for c in inspector.get_columns("blog_post")]
+    if "source_title" not in blog_cols:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE blog_post ADD COLUMN source_title VARCHAR(500)"))
+    
+    job_cols = [c["name"] for c in inspector.get_columns("job")]
+    if "stage" not in job_cols:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE job ADD COLUMN stage VARCHAR(200)"))
+    if "tokens" not in job_cols:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE job ADD COLUMN tokens INTEGER DEFAULT 0"))
+    if "cancel_requested" not in job_cols:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE job ADD COLUMN cancel_requested BOOLEAN DEFAULT 0"))
+
+    llm_call_cols = [c["name"] for c in inspector.get_columns("llm_call")]
+    if "truncated" not in llm_call_cols:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE llm_call ADD COLUMN truncated VARCHAR(20)"))
+
+    # Add new columns to Enrollment table
+    enrollment_cols = [c["name"] for c in inspector.get_columns("enrollment")]
+    if "is_mandatory" not in enrollment_cols:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE enrollment ADD COLUMN is_mandatory BOOLEAN DEFAULT 0"))
+    if "assigned_by" not in enrollment_cols:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE enrollment ADD COLUMN assigned_by INTEGER REFERENCES user(id)"))
+    if "assigned_at" not in enrollment_cols:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE enrollment ADD COLUMN assigned_at DATETIME DEFAULT CURRENT_TIMESTAMP"))
+
+
+@migration(2)
+def add_missing_indexes() -> None:
+    """Model indexes; create_all only adds them together with new tables."""
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not table.indexes:
+            continue
+        existing = inspector.get_indexes(table.name)
+        for index in table.indexes:
+            columns = [column.name for column in index.columns]
+            # MySQL already indexes foreign keys under its own names
+            covered = any(
+                other["name"] == index.name
+                or other["column_names"][: len(columns)] == columns
+                for other in existing
+            )
+            if not covered:
+                index.create(db.engine)
+
+
+@migration(3)
+def fill_course_progress() -> None:
+    """Progress summaries of databases created before they existed."""
+    if (
+        db.session.query(CourseProgress.id).first() is None
+        and db.session.query(SectionProgress.id).first() is not None
+    ):
+        print(f"Built {rebuild_course_progress()} course progress row(s)")
+
+
+@migration(4)
+def seed_pages() -> None:
+    """Default pages with richer text."""
+    default_pages = {
+        "landing": (
+            "Inicio",
+            "¡Bienvenido a Monroy Asesores!\n\nSomos una firma mexicana especializada en consultoría de Recursos Humanos, coaching ejecutivo y diseño organizacional. Explora nuestros cursos y artículos para potenciar el talento de tu empresa."
+        ),
+        "about": (
+            "Nosotros",
+            "Monroy Asesores ayuda a las organizaciones a desarrollar estrategias efectivas de capital humano. Ofrecemos coaching ejecutivo, desarrollo de estructuras organizacionales y formación especializada en español."
+        ),
+        "contact": (
+            "Contacto",
+            "Nos encantaría escucharte. Escríbenos a [info@monroyasesores.com.mx](mailto:info@monroyasesores.com.mx) o utiliza el formulario a continuación."
+        ),
+        "faq": (
+            "Preguntas Frecuentes",
+            "### ¿Qué ofrece Monroy Asesores?\nProveemos consultoría y cursos de Recursos Humanos orientados a empresas mexicanas.\n\n### ¿Los cursos tienen costo?\nAlgunos cursos son gratuitos y otros requieren pago o asignación por parte de tu empresa."
+        ),
+        "terms": (
+            "Términos y Aviso Legal",
+            "## Términos\nTu información se utiliza únicamente para administrar el sitio y tus cursos.\n\n### Aviso Legal\nParte del contenido se genera con modelos de IA y puede contener errores."
+        ),
+    }
+    # Plain inserts: the HTML columns only exist after migration 5, which
+    # renders these pages
+    existing = set(db.session.execute(db.select(Page.slug)).scalars())
+    for slug, (title, content) in default_pages.items():
+        if slug not in existing:
+            db.session.execute(
+                Page.__table__.insert().values(slug=slug, title=title, content=content)
+            )
+    db.session.commit()
+
+
+@migration(5)
+def render_markdown_columns() -> None:
+    """HTML of the Markdown text saved before it was rendered on write."""
+    inspector = inspect(db.engine)
+    for model, field in RENDERED_FIELDS:
+        table = model.__tablename__
+        if f"{field}_html" not in [c["name"] for c in inspector.get_columns(table)]:
             with db.engine.begin() as conn:
-                conn.execute(
-                    text("ALTER TABLE user ADD COLUMN is_company_admin BOOLEAN DEFAULT 0")
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {field}_html TEXT"))
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {field}_hash VARCHAR(64)"))
+    print(f"Rendered {render_stored_html()} stored text(s)")
+
+
+def seed_default_settings() -> None:
+    """Settings still unset, from their defaults and the environment.
+
+    Runs on every start, so a variable such as ``HOSTGATOR_HOST`` added after
+    the database was created is picked up; saved values are left alone.
+    """
+    defaults = {
+        "admin_email": os.environ.get("ADMIN_EMAIL"),
+        "site_topic": "recursos humanos",
+        "currency": "USD",
+        "news_api_url": get_news_api_url(),
+        "hostgator_host": os.environ.get("HOSTGATOR_HOST"),
+        "hostgator_username": os.environ.get("HOSTGATOR_USERNAME"),
+        "hostgator_password": os.environ.get("HOSTGATOR_PASSWORD"),
+        "hostgator_path": os.environ.get("HOSTGATOR_REMOTE_PATH"),
+    }
+    for key, value in defaults.items():
+        if value and not get_setting(key):
+            set_setting(key, value)
+
+
+def get_schema_version() -> int:
+    try:
+        return db.session.execute(db.select(SchemaVersion.version)).scalar() or 0
+    except (OperationalError, ProgrammingError):
+        # The table does not exist yet
+        db.session.rollback()
+        return 0
+
+
+def create_tables():
+    """Create database tables and apply pending migrations.
+
+    An up-to-date database costs one query reading its schema version and
+    one reading the settings to fill in those still unset.
+    """
+    # Ensure uploads folder exists
+    os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
+    try:
+        current = get_schema_version()
+        if current < len(migrations):
+            db.create_all()
+            for version, apply in enumerate(migrations[current:], current + 1):
+                print(f"Applying migration {version}: {apply.__name__}")
+                apply()
+                db.session.merge(
+                    SchemaVersion(id=1, version=version, applied_at=datetime.datetime.utcnow())
                 )
-        if "reset_token" not in user_cols:
-            with db.engine.begin() as conn:
-                conn.execute(text("ALTER TABLE user ADD COLUMN reset_token VARCHAR(200)"))
-        if "reset_token_expires" not in user_cols:
-            with db.engine.begin() as conn:
-                conn.execute(text("ALTER TABLE user ADD COLUMN reset_token_expires DATETIME"))
-        
-        # Add new columns to Enrollment table
-        enrollment_cols = [c["name"] for c in inspector.get_columns("enrollment")]
-        if "is_mandatory" not in enrollment_cols:
-            with db.engine.begin() as conn:
-                conn.execute(text("ALTER TABLE enrollment ADD COLUMN is_mandatory BOOLEAN DEFAULT 0"))
-        if "assigned_by" not in enrollment_cols:
-            with db.engine.begin() as conn:
-                conn.execute(text("ALTER TABLE enrollment ADD COLUMN assigned_by INTEGER REFERENCES user(id)"))
-        if "assigned_at" not in enrollment_cols:
-            with db.engine.begin() as conn:
-                conn.execute(text("ALTER TABLE enrollment ADD COLUMN assigned_at DATETIME DEFAULT CURRENT_TIMESTAMP"))
-        
-        # Initialize or update basic pages with richer default text
-        default_pages = {
-            "landing": (
-                "Inicio",
-                "¡Bienvenido a Monroy Asesores!\n\nSomos una firma mexicana especializada en consultoría de Recursos Humanos, coaching ejecutivo y diseño organizacional. Explora nuestros cursos y artículos para potenciar el talento de tu empresa."
-            ),
-            "about": (
-                "Nosotros",
-                "Monroy Asesores ayuda a las organizaciones a desarrollar estrategias efectivas de capital humano. Ofrecemos coaching ejecutivo, desarrollo de estructuras organizacionales y formación especializada en español."
-            ),
-            "contact": (
-                "Contacto",
-                "Nos encantaría escucharte. Escríbenos a [info@monroyasesores.com.mx](mailto:info@monroyasesores.com.mx) o utiliza el formulario a continuación."
-            ),
-            "faq": (
-                "Preguntas Frecuentes",
-                "### ¿Qué ofrece Monroy Asesores?\nProveemos consultoría y cursos de Recursos Humanos orientados a empresas mexicanas.\n\n### ¿Los cursos tienen costo?\nAlgunos cursos son gratuitos y otros requieren pago o asignación por parte de tu empresa."
-            ),
-            "terms": (
-                "Términos y Aviso Legal",
-                "## Términos\nTu información se utiliza únicamente para administrar el sitio y tus cursos.\n\n### Aviso Legal\nParte del contenido se genera con modelos de IA y puede contener errores."
-            ),
-        }
-        for slug, (title, content) in default_pages.items():
-            page = Page.query.filter_by(slug=slug).first()
-            if page is None:
-                db.session.add(Page(slug=slug, title=title, content=content))
-        db.session.commit()
-        if not get_setting("admin_email") and os.environ.get("ADMIN_EMAIL"):
-            set_setting("admin_email", os.environ.get("ADMIN_EMAIL"))
-        if not get_setting("site_topic"):
-            set_setting("site_topic", "recursos humanos")
-        if not get_setting("currency"):
-            set_setting("currency", "USD")
-        if not get_setting("news_api_url"):
-            set_setting("news_api_url", get_news_api_url())
-        if not get_setting("hostgator_host") and os.environ.get("HOSTGATOR_HOST"):
-            set_setting("hostgator_host", os.environ.get("HOSTGATOR_HOST"))
-        if not get_setting("hostgator_username") and os.environ.get("HOSTGATOR_USERNAME"):
-            set_setting("hostgator_username", os.environ.get("HOSTGATOR_USERNAME"))
-        if not get_setting("hostgator_password") and os.environ.get("HOSTGATOR_PASSWORD"):
-            set_setting("hostgator_password", os.environ.get("HOSTGATOR_PASSWORD"))
-        if not get_setting("hostgator_path") and os.environ.get("HOSTGATOR_REMOTE_PATH"):
-            set_setting("hostgator_path", os.environ.get("HOSTGATOR_REMOTE_PATH"))
+                db.session.commit()
+        seed_default_settings()
     except Exception as e:
         print(f"[ERROR] create_tables failed: {e}")
         try:
@@ -839,10 +2529,121 @@ def index():
     return render_template("index.html", page=page)
 
 
+BLOG_PAGE_SIZE = int(os.environ.get("BLOG_PAGE_SIZE", "10"))
+MONTH_NAMES = (
+    "enero", "febrero", "marzo", "abril", "mayo", "junio",
+    "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre",
+)
+
+
+def blog_cursor(post: BlogPost) -> str:
+    """Position of ``post`` in the blog, used in the URL of the next page."""
+    return f"{post.created_at:%Y%m%d%H%M%S%f}-{post.id}"
+
+
+def parse_blog_cursor(cursor: str) -> tuple[datetime.datetime, int]:
+    created_at, _, post_id = cursor.partition("-")
+    try:
+        return datetime.datetime.strptime(created_at, "%Y%m%d%H%M%S%f"), int(post_id)
+    except ValueError:
+        abort(404)
+
+
+def blog_month_range(year: int, month: int) -> tuple[datetime.datetime, datetime.datetime]:
+    # The end of the month must be a valid date too
+    if not 1 <= month <= 12 or not datetime.MINYEAR <= year < datetime.MAXYEAR:
+        abort(404)
+    start = datetime.datetime(year, month, 1)
+    end = datetime.datetime(year + month // 12, month % 12 + 1, 1)
+    return start, end
+
+
+def blog_posts_query(year: int | None = None, month: int | None = None):
+    """Posts newest first, optionally limited to one month."""
+    query = BlogPost.query.order_by(BlogPost.created_at.desc(), BlogPost.id.desc())
+    if year is not None:
+        start, end = blog_month_range(year, month)
+        query = query.filter(BlogPost.created_at >= start, BlogPost.created_at < end)
+    return query
+
+
+def blog_page(query, cursor: str | None = None) -> tuple[list[BlogPost], str | None]:
+    """One page of ``query`` after ``cursor`` and the cursor of the next page.
+
+    Pages are selected by position (keyset) rather than offset, so every page
+    costs the same index range read however old it is.
+    """
+    if cursor:
+        created_at, post_id = parse_blog_cursor(cursor)
+        query = query.filter(
+            db.or_(
+                BlogPost.created_at < created_at,
+                db.and_(BlogPost.created_at == created_at, BlogPost.id < post_id),
+            )
+        )
+    posts = query.limit(BLOG_PAGE_SIZE + 1).all()
+    if len(posts) > BLOG_PAGE_SIZE:
+        posts = posts[:BLOG_PAGE_SIZE]
+        return posts, blog_cursor(posts[-1])
+    return posts, None
+
+
+def blog_page_cursors(year: int | None = None, month: int | None = None) -> list[str]:
+    """Cursors of every page after the first, used to freeze the blog."""
+    query = blog_posts_query(year, month).with_entities(BlogPost.created_at, BlogPost.id)
+    rows = query.all()
+    return [
+        blog_cursor(rows[i - 1])
+        for i in range(BLOG_PAGE_SIZE, len(rows), BLOG_PAGE_SIZE)
+    ]
+
+
+def refresh_blog_archive_months() -> list[tuple[int, int, int]]:
+    """Count the posts of every month and store the list for the blog pages.
+
+    Called whenever posts are added or deleted.
+    """
+    year = db.extract("year", BlogPost.created_at)
+    month = db.extract("month", BlogPost.created_at)
+    rows = db.session.execute(
+        db.select(year, month, db.func.count(BlogPost.id))
+        .group_by(year, month)
+        .order_by(year.desc(), month.desc())
+    ).all()
+    months = [(int(y), int(m), count) for y, m, count in rows if y is not None]
+    set_setting("blog_archive_months", json.dumps(months))
+    return months
+
+
+def blog_archive_months() -> list[tuple[int, int, int]]:
+    """``(year, month, post count)`` of every month with posts, newest first.
+
+    Read from a setting so rendering the blog does not group every post.
+    """
+    stored = get_setting("blog_archive_months")
+    if stored is None:
+        return refresh_blog_archive_months()
+    return [tuple(item) for item in json.loads(stored)]
+
+
 @app.route("/blog/")
-def blog():
-    posts = BlogPost.query.order_by(BlogPost.created_at.desc()).all()
-    return render_template("blog.html", posts=posts)
+@app.route("/blog/before/<cursor>/")
+@app.route("/blog/<int:year>/<int:month>/")
+@app.route("/blog/<int:year>/<int:month>/before/<cursor>/")
+def blog(year=None, month=None, cursor=None):
+    posts, next_cursor = blog_page(blog_posts_query(year, month), cursor)
+    if cursor and not posts:
+        abort(404)
+    return render_template(
+        "blog.html",
+        posts=posts,
+        next_cursor=next_cursor,
+        cursor=cursor,
+        year=year,
+        month=month,
+        months=blog_archive_months(),
+        month_names=MONTH_NAMES,
+    )
 
 
 @app.route("/courses/")
@@ -859,26 +2660,16 @@ def courses():
         courses = Course.query.filter(Course.company_id == None).all()
     
     # Get completion status for each course
+    progress = load_course_progress(user_id, courses)
     course_progress = {}
     for course in courses:
-        sections = CourseSection.query.filter_by(course_id=course.id).all()
-        completed = [
-            p.section_id
-            for p in SectionProgress.query.filter_by(user_id=user_id, completed=True)
-            .join(CourseSection)
-            .filter(CourseSection.course_id == course.id)
-            .all()
-        ]
-        quiz_passed = session.get("quiz_passed", {}).get(str(course.id))
-        all_done = bool(sections) and all(s.id in completed for s in sections)
-        is_assigned = False
-        if course.company_id:
-            is_assigned = Enrollment.query.filter_by(user_id=user_id, course_id=course.id).first() is not None
-        
+        state = progress[course.id]
+        quiz_passed = session.get("quiz_passed", {}).get(str(course.id)) or state["quiz_passed"]
+        all_done = state["all_done"]
         course_progress[course.id] = {
             'completed': all_done and quiz_passed,
-            'in_progress': len(completed) > 0 and not (all_done and quiz_passed),
-            'is_assigned': is_assigned
+            'in_progress': state["completed"] > 0 and not (all_done and quiz_passed),
+            'is_assigned': bool(course.company_id) and state["enrolled"]
         }
     
     return render_template("courses.html", courses=courses, course_progress=course_progress)
@@ -902,22 +2693,17 @@ def my_courses():
     else:
         all_courses = Course.query.filter(Course.company_id == None).all()
     
+    progress = load_course_progress(user_id, all_courses)
     for course in all_courses:
-        sections = CourseSection.query.filter_by(course_id=course.id).all()
-        completed = [
-            p.section_id
-            for p in SectionProgress.query.filter_by(user_id=user_id, completed=True)
-            .join(CourseSection)
-            .filter(CourseSection.course_id == course.id)
-            .all()
-        ]
-        quiz_passed = session.get("quiz_passed", {}).get(str(course.id))
-        all_done = bool(sections) and all(s.id in completed for s in sections)
+        quiz_passed = (
+            session.get("quiz_passed", {}).get(str(course.id))
+            or progress[course.id]["quiz_passed"]
+        )
         
-        if all_done and quiz_passed:
+        if progress[course.id]["all_done"] and quiz_passed:
             completed_courses.append({
                 'course': course,
-                'can_get_certificate': user_can_get_certificate(course, user_id)
+                'can_get_certificate': certificate_allowed(course, user, progress[course.id])
             })
     
     return render_template("my_courses.html", completed_courses=completed_courses)
@@ -1146,6 +2932,183 @@ def user_profile():
     return render_template("user_profile.html", user=user, assigned_courses=assigned_courses)
 
 
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "0")) or os.cpu_count() or 1
+USER_IMPORT_BATCH_SIZE = int(os.environ.get("USER_IMPORT_BATCH_SIZE", "500"))
+# Uploaded files wait here for the worker and are deleted once imported
+USER_IMPORT_DIR = os.environ.get(
+    "USER_IMPORT_DIR", os.path.join(app.instance_path, "user_imports")
+)
+# Rejected rows kept in the job result; the total is always reported
+USER_IMPORT_MAX_ERRORS = int(os.environ.get("USER_IMPORT_MAX_ERRORS", "500"))
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+_password_pool = None
+_password_pool_lock = threading.Lock()
+
+
+def get_password_pool():
+    global _password_pool
+    with _password_pool_lock:
+        if _password_pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # Forking a threaded server could copy locks held by other threads
+            _password_pool = ProcessPoolExecutor(
+                PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+    return _password_pool
+
+
+def hash_passwords(passwords: list[str]) -> list[str]:
+    """``generate_password_hash`` of every password, spread over processes."""
+    if PASSWORD_HASH_WORKERS == 1 or len(passwords) < 2 * PASSWORD_HASH_WORKERS:
+        return [generate_password_hash(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (PASSWORD_HASH_WORKERS * 4))
+    return list(get_password_pool().map(generate_password_hash, passwords, chunksize=chunksize))
+
+
+def import_users_csv(stream, company_id: int, batch_size: int = USER_IMPORT_BATCH_SIZE) -> dict:
+    """Create the users of a CSV file (``email`` and optional ``password``
+    columns) in ``company_id``.
+
+    The file is read in batches: each batch is checked against the existing
+    emails with one query, its passwords are hashed in the process pool and
+    its users inserted with one statement. Users without a password get a
+    random one and set theirs through the password reset. Returns the number
+    of users created and the rejected rows as ``(line, email, message)``.
+    """
+    result = {"created": 0, "errors": []}
+    seen = set()
+    batch = []
+
+    def flush():
+        emails = [email for _, email, _ in batch]
+        existing = set(
+            db.session.execute(db.select(User.email).where(User.email.in_(emails))).scalars()
+        )
+        new = []
+        for line, email, password in batch:
+            if email in existing:
+                result["errors"].append((line, email, "Correo ya registrado"))
+            else:
+                new.append((email, password))
+        batch.clear()
+        if new:
+            hashes = hash_passwords([password for _, password in new])
+            inserted = upsert(
+                User.__table__,
+                [
+                    {"email": email, "password_hash": password_hash, "company_id": company_id}
+                    for (email, _), password_hash in zip(new, hashes)
+                ],
+                ("email",),
+            )
+            db.session.commit()
+            # Emails registered since the check above are skipped by the insert
+            result["created"] += inserted.rowcount
+        report_progress(stage=f"{result['created']} usuario(s) creados")
+
+    reader = csv.DictReader(TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    try:
+        columns = [(name or "").strip().lower() for name in reader.fieldnames or []]
+        if "email" not in columns:
+            result["errors"].append((1, "", "El archivo debe tener una columna 'email'"))
+            return result
+        reader.fieldnames = columns
+        for row in reader:
+            line = reader.line_num
+            email = (row.get("email") or "").strip().lower()
+            password = (row.get("password") or "").strip()
+            if not email and not password:
+                continue
+            if not EMAIL_PATTERN.match(email) or len(email) > 200:
+                result["errors"].append((line, email, "Correo no válido"))
+            elif email in seen:
+                result["errors"].append((line, email, "Correo repetido en el archivo"))
+            elif password and len(password) < 6:
+                result["errors"].append(
+                    (line, email, "La contraseña debe tener al menos 6 caracteres")
+                )
+            else:
+                seen.add(email)
+                batch.append((line, email, password or secrets.token_urlsafe(12)))
+                if len(batch) >= batch_size:
+                    flush()
+    except (UnicodeDecodeError, csv.Error) as e:
+        result["errors"].append(
+            (reader.line_num or 1, "", f"No se pudo leer el archivo: {e}")
+        )
+    if batch:
+        flush()
+    result["errors"].sort()
+    return result
+
+
+def queue_user_import(file, company_id: int) -> Job:
+    """Save an uploaded CSV of users and queue its import for the worker."""
+    os.makedirs(USER_IMPORT_DIR, exist_ok=True)
+    path = os.path.join(USER_IMPORT_DIR, f"{secrets.token_hex(16)}.csv")
+    file.save(path)
+    return enqueue_job("import_users", path=path, company_id=company_id)
+
+
+@job_handler("import_users")
+def import_users_job(path: str, company_id: int) -> dict:
+    try:
+        with open(path, "rb") as fh:
+            result = import_users_csv(fh, company_id)
+    finally:
+        # The file may hold passwords in clear text
+        os.remove(path)
+    result["error_count"] = len(result["errors"])
+    result["errors"] = result["errors"][:USER_IMPORT_MAX_ERRORS]
+    return result
+
+
+COMPANY_ENROLLMENTS_PAGE_SIZE = int(os.environ.get("COMPANY_ENROLLMENTS_PAGE_SIZE", "50"))
+
+
+def assign_courses(
+    user_ids: list[int],
+    course_ids: list[int],
+    *,
+    is_mandatory: bool,
+    assigned_by: int,
+    batch_size: int = 500,
+) -> int:
+    """Enroll every user in every course in one transaction.
+
+    Existing enrollments keep their payment status and get the new type,
+    assigner and date. Returns the number of user/course pairs written.
+    """
+    now = datetime.datetime.utcnow()
+    rows = [
+        {
+            "user_id": user_id,
+            "course_id": course_id,
+            "paid": True,
+            "is_mandatory": is_mandatory,
+            "assigned_by": assigned_by,
+            "assigned_at": now,
+        }
+        for user_id in user_ids
+        for course_id in course_ids
+    ]
+    for start in range(0, len(rows), batch_size):
+        upsert(
+            Enrollment.__table__,
+            rows[start : start + batch_size],
+            ("user_id", "course_id"),
+            update=lambda new: {
+                "is_mandatory": new.is_mandatory,
+                "assigned_by": new.assigned_by,
+                "assigned_at": new.assigned_at,
+            },
+        )
+    db.session.commit()
+    return len(rows)
+
+
 @app.route("/company_admin/", methods=["GET", "POST"])
 def company_admin():
     user_id = session.get("user_id")
@@ -1156,6 +3119,41 @@ def company_admin():
         abort(403)
     if request.method == "POST":
         action = request.form.get("action")
+        if action == "import_users":
+            file = request.files.get("file")
+            if not file or not file.filename:
+                flash("Selecciona un archivo CSV", "danger")
+                return redirect(url_for("company_admin"))
+            job = queue_user_import(file, user.company_id)
+            return redirect(url_for("user_import_status", job_id=job.id))
+        if action == "bulk_assign":
+            # Ids from other companies are dropped by the filters
+            users_query = db.select(User.id).where(User.company_id == user.company_id)
+            if not request.form.get("all_users"):
+                users_query = users_query.where(
+                    User.id.in_(request.form.getlist("user_ids", type=int))
+                )
+            user_ids = db.session.execute(users_query).scalars().all()
+            course_ids = db.session.execute(
+                db.select(Course.id).where(
+                    Course.company_id == user.company_id,
+                    Course.id.in_(request.form.getlist("course_ids", type=int)),
+                )
+            ).scalars().all()
+            if not user_ids or not course_ids:
+                flash("Selecciona al menos un usuario y un curso", "danger")
+            else:
+                is_mandatory = request.form.get("is_mandatory") == "1"
+                count = assign_courses(
+                    user_ids, course_ids, is_mandatory=is_mandatory, assigned_by=user.id
+                )
+                type_text = "obligatorios" if is_mandatory else "opcionales"
+                flash(
+                    f"{len(course_ids)} curso(s) {type_text} asignados a "
+                    f"{len(user_ids)} usuario(s) ({count} asignaciones)",
+                    "success",
+                )
+            return redirect(url_for("company_admin"))
         target_user_id = int(request.form.get("user_id"))
         course_id = int(request.form.get("course_id"))
         target_user = User.query.get_or_404(target_user_id)
@@ -1199,18 +3197,65 @@ def company_admin():
             db.session.commit()
             flash("Curso desasignado", "info")
         return redirect(url_for("company_admin"))
-    company_users = User.query.filter_by(company_id=user.company_id).all()
-    courses = Course.query.filter_by(company_id=user.company_id).all()
-    enrollments = (
-        Enrollment.query.join(User)
-        .filter(User.company_id == user.company_id)
+    company_users = (
+        User.query.filter_by(company_id=user.company_id)
+        .options(load_only(User.email))
+        .order_by(User.email)
         .all()
     )
+    courses = (
+        Course.query.filter_by(company_id=user.company_id)
+        .options(load_only(Course.title))
+        .order_by(Course.title)
+        .all()
+    )
+    # User, course and assigner come in the same query as the enrollments
+    enrollments = db.paginate(
+        db.select(Enrollment)
+        .join(Enrollment.user)
+        .where(User.company_id == user.company_id)
+        .options(
+            contains_eager(Enrollment.user).load_only(User.email),
+            joinedload(Enrollment.course).load_only(Course.title),
+            joinedload(Enrollment.assigner).load_only(User.email),
+        )
+        .order_by(Enrollment.assigned_at.desc(), Enrollment.id.desc()),
+        page=request.args.get("page", 1, type=int),
+        per_page=COMPANY_ENROLLMENTS_PAGE_SIZE,
+        error_out=False,
+    )
     return render_template(
         "company_admin.html", users=company_users, courses=courses, enrollments=enrollments
     )
 
 
+@app.route("/company_admin/imports/<int:job_id>/")
+def user_import_status(job_id):
+    """Progress and result of a user import, for the site admin or an
+    administrator of the company the users are imported into."""
+    job = db.first_or_404(
+        db.select(Job).where(Job.id == job_id, Job.kind == "import_users")
+    )
+    company = db.session.get(Company, json.loads(job.payload)["company_id"])
+    if session.get("logged_in"):
+        back_url = url_for("admin", tab="general")
+    else:
+        user_id = session.get("user_id")
+        if not user_id:
+            return redirect(url_for("user_login"))
+        user = User.query.get_or_404(user_id)
+        if not user.is_company_admin or company is None or user.company_id != company.id:
+            abort(403)
+        back_url = url_for("company_admin")
+    return render_template(
+        "user_import.html",
+        job=job,
+        result=json.loads(job.result) if job.result else None,
+        company=company,
+        back_url=back_url,
+    )
+
+
 @app.route("/courses/<int:course_id>/")
 def course_detail(course_id):
     user_id = session.get("user_id")
@@ -1224,16 +3269,15 @@ def course_detail(course_id):
         .order_by(CourseSection.order)
         .all()
     )
-    completed = [
-        p.section_id
-        for p in SectionProgress.query.filter_by(user_id=user_id, completed=True)
-        .join(CourseSection)
-        .filter(CourseSection.course_id == course_id)
-        .all()
-    ]
-    all_done = bool(sections) and all(s.id in completed for s in sections)
-    quiz_passed = session.get("quiz_passed", {}).get(str(course_id))
-    can_get_certificate = user_can_get_certificate(course, user_id)
+    completed = completed_section_ids(user_id, course_id)
+    progress = load_course_progress(user_id, [course])[course_id]
+    all_done = progress["all_done"]
+    quiz_passed = (
+        session.get("quiz_passed", {}).get(str(course_id)) or progress["quiz_passed"]
+    )
+    can_get_certificate = certificate_allowed(
+        course, db.session.get(User, user_id), progress
+    )
     return render_template(
         "course_detail.html",
         course=course,
@@ -1406,7 +3450,7 @@ def enroll_success(course_id):
     session_id = request.args.get("session_id")
     if not session_id:
         abort(400)
-    checkout = stripe.checkout.Session.retrieve(session_id)
+    checkout = get_stripe().checkout.Session.retrieve(session_id)
     if checkout.payment_status == "paid":
         user_id = session.get("user_id")
         if not user_id:
@@ -1435,7 +3479,9 @@ def certificate(course_id):
         return resp
     
     user_id = session.get("user_id")
-    if not user_can_get_certificate(course, user_id):
+    user = db.session.get(User, user_id) if user_id else None
+    progress = load_course_progress(user_id, [course])[course_id] if user else None
+    if not user or not certificate_allowed(course, user, progress):
         # Redirect to payment if needed
         if course.price_cents and course.price_cents > 0 and course.company_id is None:
             return render_template("certificate_payment.html", course=course, paypal_client_id=PAYPAL_CLIENT_ID)
@@ -1447,18 +3493,10 @@ def certificate(course_id):
         .order_by(CourseSection.order)
         .all()
     )
-    if user_id:
-        completed = [
-            p.section_id
-            for p in SectionProgress.query.filter_by(user_id=user_id, completed=True)
-            .join(CourseSection)
-            .filter(CourseSection.course_id == course_id)
-            .all()
-        ]
-    else:
-        completed = session.get("completed_sections", {}).get(str(course_id), [])
-    quiz_passed = session.get("quiz_passed", {}).get(str(course_id))
-    if sections and not all(s.id in completed for s in sections):
+    quiz_passed = (
+        session.get("quiz_passed", {}).get(str(course_id)) or progress["quiz_passed"]
+    )
+    if sections and not progress["all_done"]:
         abort(403)
     if not quiz_passed:
         abort(403)
@@ -1506,15 +3544,11 @@ def course_section(course_id, section_id):
     if resp:
         return resp
     section = CourseSection.query.get_or_404(section_id)
+    if section.course_id != course_id:
+        abort(404)
     user_id = session.get("user_id")
     if user_id:
-        completed = [
-            p.section_id
-            for p in SectionProgress.query.filter_by(user_id=user_id, completed=True)
-            .join(CourseSection)
-            .filter(CourseSection.course_id == course_id)
-            .all()
-        ]
+        completed = completed_section_ids(user_id, course_id)
     else:
         completed = session.get("completed_sections", {}).get(str(course_id), [])
     if request.method == "POST":
@@ -1534,17 +3568,7 @@ def course_section(course_id, section_id):
                 error=True,
             )
         if user_id:
-            progress = SectionProgress.query.filter_by(
-                user_id=user_id, section_id=section_id
-            ).first()
-            if not progress:
-                progress = SectionProgress(
-                    user_id=user_id, section_id=section_id, completed=True
-                )
-                db.session.add(progress)
-            else:
-                progress.completed = True
-            db.session.commit()
+            record_section_completed(user_id, section.course_id, section.id)
         else:
             completed.append(section_id)
             session.setdefault("completed_sections", {})[str(course_id)] = completed
@@ -1586,6 +3610,8 @@ def course_quiz(course_id):
         passed = correct >= 8
         if passed:
             session.setdefault("quiz_passed", {})[str(course_id)] = True
+            if session.get("user_id"):
+                record_quiz_passed(session["user_id"], course_id)
         session.modified = True
     return render_template(
         "course_quiz.html",
@@ -1596,6 +3622,10 @@ def course_quiz(course_id):
     )
 
 
+ADMIN_TABS = ("general", "blog", "courses", "news", "pages")
+ADMIN_PAGE_SIZE = int(os.environ.get("ADMIN_PAGE_SIZE", "20"))
+
+
 @app.route("/admin/", methods=["GET", "POST"])
 def admin():
     resp = require_login()
@@ -1604,24 +3634,25 @@ def admin():
     if request.method == "POST":
         action = request.form.get("action")
         if action == "blog":
-            title, content = generate_blog_post()
-            post = BlogPost(title=title, content=content)
-            db.session.add(post)
-            db.session.commit()
+            job = enqueue_job("blog")
+            flash(f"Generación de entrada en cola (tarea #{job.id})", "info")
         elif action == "update_blog":
             post = BlogPost.query.get_or_404(request.form.get("id"))
             post.title = request.form.get("title")
             post.content = request.form.get("content")
+            store_rendered_html(post)
             db.session.commit()
         elif action == "delete_blog":
             post = BlogPost.query.get_or_404(request.form.get("id"))
             db.session.delete(post)
             db.session.commit()
+            refresh_blog_archive_months()
         elif action == "course":
             topic = request.form.get("topic", "recursos humanos")
             difficulty = request.form.get("difficulty", "Beginner")
             prerequisites = request.form.get("prerequisites", "")
             module_count = min(int(request.form.get("module_count", 3)), 10)
+            concurrency = max(1, int(request.form.get("concurrency") or LLM_CONCURRENCY))
             description = request.form.get("description", "").strip()
             price_cents = int(request.form.get("price_cents", 0))
             file = request.files.get("icon")
@@ -1638,8 +3669,9 @@ def admin():
                     company = Company(name=company_name)
                     db.session.add(company)
                     db.session.commit()
-            course = create_course(
-                topic,
+            job = enqueue_job(
+                "course",
+                topic=topic,
                 module_count=module_count,
                 difficulty=difficulty,
                 prerequisites=prerequisites,
@@ -1647,28 +3679,14 @@ def admin():
                 icon=icon_name,
                 company_id=company.id if company else None,
                 price_cents=price_cents,
+                concurrency=concurrency,
             )
-            session.setdefault("completed_sections", {}).pop(str(course.id), None)
-            session.setdefault("quiz_scores", {}).pop(str(course.id), None)
-            session.setdefault("quiz_passed", {}).pop(str(course.id), None)
-            
-            # Delete section progress for this course
-            section_ids = db.session.query(CourseSection.id).filter(
-                CourseSection.course_id == course.id
-            ).subquery()
-            
-            SectionProgress.query.filter(
-                SectionProgress.section_id.in_(
-                    db.session.query(section_ids.c.id)
-                )
-            ).delete(synchronize_session=False)
-            
-            db.session.commit()
-            session.modified = True
+            flash(f"Generación del curso en cola (tarea #{job.id})", "info")
         elif action == "update_course":
             course = Course.query.get_or_404(request.form.get("id"))
             course.title = request.form.get("title")
             course.description = request.form.get("description")
+            store_rendered_html(course, "description")
             course.difficulty = request.form.get("difficulty")
             course.prerequisites = request.form.get("prerequisites")
             if request.form.get("remove_icon"):
@@ -1705,8 +3723,9 @@ def admin():
                     )
                 ).delete(synchronize_session=False)
                 
-                # 2. Delete enrollments (references course)
+                # 2. Delete enrollments and progress summaries (reference course)
                 Enrollment.query.filter_by(course_id=course.id).delete()
+                CourseProgress.query.filter_by(course_id=course.id).delete()
                 
                 # 3. Delete course sections (references course)
                 CourseSection.query.filter_by(course_id=course.id).delete()
@@ -1732,6 +3751,7 @@ def admin():
             section = CourseSection.query.get_or_404(request.form.get("id"))
             section.title = request.form.get("title")
             section.content = request.form.get("content")
+            store_rendered_html(section)
             section.question = request.form.get("question")
             section.answer = request.form.get("answer")
             db.session.commit()
@@ -1743,6 +3763,7 @@ def admin():
                 # Then delete the section
                 db.session.delete(section)
                 db.session.commit()
+                rebuild_course_progress(section.course_id)
                 flash("Sección eliminada exitosamente", "success")
             except Exception as e:
                 db.session.rollback()
@@ -1767,22 +3788,11 @@ def admin():
                 flash(f"Error al eliminar la pregunta: {str(e)}", "danger")
         elif action == "generate_questions":
             course = Course.query.get_or_404(request.form.get("id"))
-            QuizQuestion.query.filter_by(course_id=course.id).delete()
-            for q in generate_quiz_questions(course.title, 10):
-                question = QuizQuestion(
-                    course_id=course.id,
-                    question=q["question"],
-                    option_a=q["a"],
-                    option_b=q["b"],
-                    option_c=q["c"],
-                    option_d=q["d"],
-                    answer=q["answer"],
-                    order=q["order"],
-                )
-                db.session.add(question)
-            db.session.commit()
+            job = enqueue_job("generate_questions", course_id=course.id)
+            flash(f"Regeneración del examen en cola (tarea #{job.id})", "info")
         elif action == "fetch_news":
-            fetch_news_items()
+            job = enqueue_job("fetch_news")
+            flash(f"Actualización de noticias en cola (tarea #{job.id})", "info")
         elif action == "create_news":
             title = request.form.get("title", "")
             url = request.form.get("url", "")
@@ -1818,8 +3828,9 @@ def admin():
                 # 2. Delete all section progress (references course_section)
                 SectionProgress.query.delete()
                 
-                # 3. Delete all enrollments (references course)
+                # 3. Delete all enrollments and progress summaries (reference course)
                 Enrollment.query.delete()
+                CourseProgress.query.delete()
                 
                 # 4. Delete all quiz questions (references course)
                 QuizQuestion.query.delete()
@@ -1843,6 +3854,7 @@ def admin():
                 NewsItem.query.delete()
                 
                 db.session.commit()
+                refresh_blog_archive_months()
                 flash("Todo el contenido generado por IA ha sido eliminado exitosamente", "success")
             except Exception as e:
                 db.session.rollback()
@@ -1885,6 +3897,15 @@ def admin():
                     flash("Ya existe una empresa con ese nombre", "danger")
             else:
                 flash("Todos los campos son obligatorios", "danger")
+        elif action == "import_users":
+            company = db.first_or_404(
+                db.select(Company).where(Company.id == request.form.get("company_id", type=int))
+            )
+            file = request.files.get("file")
+            if file and file.filename:
+                job = queue_user_import(file, company.id)
+                return redirect(url_for("user_import_status", job_id=job.id))
+            flash("Selecciona un archivo CSV", "danger")
         elif action == "upload_image":
             slug = secure_filename(request.form.get("slug", ""))
             allowed = [p.slug for p in Page.query.all()] + ["hero"]
@@ -1907,37 +3928,167 @@ def admin():
             page = Page.query.filter_by(slug=slug).first()
             if page:
                 page.content = content
+                store_rendered_html(page)
                 db.session.commit()
-        return redirect(url_for("admin"))
-    pages = Page.query.all()
-    posts = BlogPost.query.order_by(BlogPost.created_at.desc()).all()
-    courses = Course.query.all()
-    items = NewsItem.query.all()
-    last_fetch = get_setting("last_news_fetch")
-    site_topic = get_setting("site_topic", "recursos humanos")
-    news_api_url = get_setting("news_api_url", get_news_api_url())
-    currency = get_setting("currency", "USD")
-    hostgator_host = get_setting("hostgator_host", "")
-    hostgator_username = get_setting("hostgator_username", "")
-    hostgator_password = get_setting("hostgator_password", "")
-    hostgator_path = get_setting("hostgator_path", "/public_html")
-    return render_template(
-        "admin.html",
-        pages=pages,
-        posts=posts,
-        courses=courses,
-        items=items,
-        last_news_fetch=last_fetch,
-        site_topic=site_topic,
-        news_api_url=news_api_url,
-        currency=currency,
-        hostgator_host=hostgator_host,
-        hostgator_username=hostgator_username,
-        hostgator_password=hostgator_password,
-        hostgator_path=hostgator_path,
+        # Forms post to the URL of the tab they are on; go back to it
+        back = {key: request.args[key] for key in ("tab", "page", "edit") if key in request.args}
+        if action in ("delete_blog", "delete_course", "clear_ai_content"):
+            back.pop("edit", None)
+        return redirect(url_for("admin", **back))
+
+    # Only the open tab is loaded. Lists read the columns they show and full
+    # texts are loaded for the item opened with ``edit``.
+    tab = request.args.get("tab", "general")
+    if tab not in ADMIN_TABS:
+        abort(404)
+    page = request.args.get("page", 1, type=int)
+    edit = request.args.get("edit", type=int)
+    context = {"tab": tab, "page": page, "edit": edit}
+    if tab == "general":
+        context.update(
+            llm_stats=llm_telemetry_summary(),
+            settings_stats=settings_cache_stats,
+            pages=Page.query.options(load_only(Page.slug, Page.title)).all(),
+            companies=Company.query.order_by(Company.name).all(),
+            site_topic=get_setting("site_topic", "recursos humanos"),
+            news_api_url=get_setting("news_api_url", get_news_api_url()),
+            currency=get_setting("currency", "USD"),
+            hostgator_host=get_setting("hostgator_host", ""),
+            hostgator_username=get_setting("hostgator_username", ""),
+            hostgator_password=get_setting("hostgator_password", ""),
+            hostgator_path=get_setting("hostgator_path", "/public_html"),
+        )
+    elif tab == "blog":
+        if edit:
+            context["post"] = db.get_or_404(BlogPost, edit)
+        context["posts"] = db.paginate(
+            db.select(BlogPost)
+            .options(load_only(BlogPost.title, BlogPost.created_at))
+            .order_by(BlogPost.created_at.desc(), BlogPost.id.desc()),
+            page=page,
+            per_page=ADMIN_PAGE_SIZE,
+            error_out=False,
+        )
+    elif tab == "courses":
+        if edit:
+            context["course"] = db.first_or_404(
+                db.select(Course)
+                .where(Course.id == edit)
+                .options(selectinload(Course.sections), selectinload(Course.quiz_questions))
+            )
+        context["llm_concurrency"] = LLM_CONCURRENCY
+        context["courses"] = db.paginate(
+            db.select(Course)
+            .options(
+                load_only(Course.title, Course.difficulty, Course.price_cents),
+                selectinload(Course.company).load_only(Company.name),
+                selectinload(Course.sections).load_only(
+                    CourseSection.title, CourseSection.order
+                ),
+                selectinload(Course.quiz_questions).load_only(QuizQuestion.order),
+            )
+            .order_by(Course.id.desc()),
+            page=page,
+            per_page=ADMIN_PAGE_SIZE,
+            error_out=False,
+        )
+    elif tab == "news":
+        context["last_news_fetch"] = get_setting("last_news_fetch")
+        context["items"] = db.paginate(
+            db.select(NewsItem).order_by(NewsItem.created_at.desc(), NewsItem.id.desc()),
+            page=page,
+            per_page=ADMIN_PAGE_SIZE,
+            error_out=False,
+        )
+    elif tab == "pages":
+        if edit:
+            context["edit_page"] = db.get_or_404(Page, edit)
+        context["pages"] = Page.query.options(load_only(Page.slug, Page.title)).all()
+    return render_template("admin.html", **context)
+
+
+@app.route("/admin/jobs/")
+def admin_jobs():
+    resp = require_login()
+    if resp:
+        return resp
+    jobs = Job.query.order_by(Job.id.desc()).limit(50).all()
+    return render_template("jobs.html", jobs=jobs, max_running=JOB_MAX_RUNNING)
+
+
+@app.route("/admin/jobs/<int:job_id>.json")
+def admin_job_status(job_id):
+    resp = require_login()
+    if resp:
+        return resp
+    job = Job.query.get_or_404(job_id)
+    return jsonify(job.to_dict())
+
+
+@app.route("/admin/jobs/events")
+def admin_jobs_events():
+    """Server-sent events with the stage and token count of the jobs listed
+    in ``ids`` (comma separated) until they end or the stream's time is up.
+
+    One stream serves the whole jobs page and reads all its jobs with one
+    query every two seconds.
+    """
+    resp = require_login()
+    if resp:
+        return resp
+    ids = {int(i) for i in request.args.get("ids", "").split(",") if i.isdigit()}
+
+    def events():
+        last = {}
+        idle = 0
+        ends = time.monotonic() + JOB_EVENTS_MAX_SECONDS
+        # Reconnect delay in milliseconds
+        yield "retry: 2000\n\n"
+        while ids and time.monotonic() < ends:
+            jobs = db.session.execute(
+                db.select(Job).where(Job.id.in_(ids)).execution_options(populate_existing=True)
+            ).scalars()
+            changed = False
+            found = set()
+            for job in jobs:
+                found.add(job.id)
+                data = job.to_dict()
+                if data != last.get(job.id):
+                    last[job.id] = data
+                    changed = True
+                    yield f"data: {json.dumps(data)}\n\n"
+                if job.status not in ("queued", "running"):
+                    ids.discard(job.id)
+            # Deleted or unknown jobs are not followed
+            ids.intersection_update(found)
+            # End the transaction so the next read sees the worker's updates
+            db.session.rollback()
+            idle = 0 if changed else idle + 1
+            if idle and idle % 8 == 0:
+                # Comment line keeps proxies from closing the connection
+                yield ": keep-alive\n\n"
+            if ids:
+                time.sleep(2)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
+@app.route("/admin/jobs/<int:job_id>/cancel", methods=["POST"])
+def admin_job_cancel(job_id):
+    resp = require_login()
+    if resp:
+        return resp
+    job = Job.query.get_or_404(job_id)
+    cancel_job(job)
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify(job.to_dict())
+    return redirect(url_for("admin_jobs"))
+
+
 @app.route("/admin/deploy_hostgator", methods=["POST"])
 def deploy_hostgator_route():
     require_login()
@@ -1,6 +1,164 @@
-"""Batch course creation script."""
+"""Batch course creation script.
+
+Every course is built in stages (overview, module titles, each module, quiz)
+and each finished stage is checkpointed in a JSON state file. Running the same
+command again after a crash resumes from the last completed stage instead of
+starting over. Several courses can be built in parallel while a global cap
+limits the number of requests sent to the model at once.
+"""
 import argparse
-from app import app, create_tables, generate_course_topics, create_course
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from app import (
+    app,
+    CourseSession,
+    create_tables,
+    generate_course_topics,
+    generate_course_overview,
+    generate_section_titles,
+    generate_module_content,
+    generate_quiz_questions,
+    run_concurrently,
+    save_course,
+    set_llm_concurrency_limit,
+    warm_up_llm,
+)
+
+
+class BatchState:
+    """Checkpoint file shared by all course workers of a batch run.
+
+    Courses are keyed by their position in the topic list, since the model
+    may suggest the same title twice.
+    """
+
+    def __init__(self, path: str, run: dict, fresh: bool = False):
+        self.path = path
+        self._lock = threading.Lock()
+        data = None
+        if not fresh and os.path.exists(path):
+            with open(path, encoding="utf-8") as fh:
+                data = json.load(fh)
+            if data.get("run") != run:
+                raise SystemExit(
+                    f"{path} belongs to a different batch ({data.get('run')}). "
+                    "Use --fresh to discard it or --state to pick another file."
+                )
+        self.data = data or {"run": run, "topics": None, "courses": {}}
+
+    def save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(self.data, fh, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def course(self, index: int) -> dict:
+        with self._lock:
+            return self.data["courses"].setdefault(str(index), {"modules": {}})
+
+    def checkpoint(self, index: int, **values) -> None:
+        with self._lock:
+            self.data["courses"].setdefault(str(index), {"modules": {}}).update(values)
+            self.save()
+
+    def checkpoint_module(self, index: int, order: int, content: str) -> None:
+        with self._lock:
+            self.data["courses"][str(index)]["modules"][str(order)] = content
+            self.save()
+
+
+class Throughput:
+    """Counters for the end-of-run summary."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.courses = 0
+        self.modules = 0
+        self.module_seconds = 0.0
+        self.failed = 0
+
+    def add(self, **counts) -> None:
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def summary(self) -> str:
+        elapsed = time.time() - self.started
+        per_hour = self.courses / elapsed * 3600 if elapsed else 0
+        wall_per_module = elapsed / self.modules if self.modules else 0
+        call_per_module = self.module_seconds / self.modules if self.modules else 0
+        return (
+            f"Built {self.courses} course(s), {self.modules} module(s) in {elapsed:.0f}s "
+            f"({self.failed} failed)\n"
+            f"  {per_hour:.2f} courses/hour\n"
+            f"  {wall_per_module:.1f}s wall time per module, "
+            f"{call_per_module:.1f}s per module request"
+        )
+
+
+def build_course(index: int, title: str, args, state: BatchState, stats: Throughput) -> int:
+    """Run the remaining stages for topic ``index`` and return the saved course id."""
+    entry = state.course(index)
+    if entry.get("course_id"):
+        return entry["course_id"]
+
+    # The evaluated context only lives for this run; a resumed course falls
+    # back to the shared system prompt
+    session = CourseSession(title) if args.session else None
+    if "overview" not in entry:
+        overview = generate_course_overview(title, session=session)
+        state.checkpoint(index, overview=overview)
+    # An empty answer is not checkpointed so the rerun asks again
+    if "titles" not in entry:
+        titles = generate_section_titles(title, args.modules, session=session, pad=False)
+        if not titles:
+            raise RuntimeError("no module titles were generated")
+        titles += [f"Module {i}" for i in range(len(titles) + 1, args.modules + 1)]
+        state.checkpoint(index, titles=titles)
+
+    def build_module(item):
+        order, module_title = item
+        started = time.time()
+        content = generate_module_content(title, module_title, session=session)
+        state.checkpoint_module(index, order, content)
+        stats.add(modules=1, module_seconds=time.time() - started)
+
+    pending = [
+        (order, module_title)
+        for order, module_title in enumerate(entry["titles"], 1)
+        if str(order) not in entry["modules"]
+    ]
+    run_concurrently(build_module, pending, args.max_requests)
+
+    if "quiz" not in entry:
+        quiz = generate_quiz_questions(title, 10, session=session)
+        if not quiz:
+            raise RuntimeError("no quiz questions were generated")
+        state.checkpoint(index, quiz=quiz)
+
+    sections = [
+        {"title": module_title, "content": entry["modules"][str(order)], "order": order}
+        for order, module_title in enumerate(entry["titles"], 1)
+    ]
+    with app.app_context():
+        course = save_course(
+            title,
+            description=entry["overview"],
+            sections=sections,
+            questions=entry["quiz"],
+            difficulty=args.difficulty,
+            prerequisites=args.prerequisites,
+        )
+        course_id = course.id
+    state.checkpoint(index, course_id=course_id)
+    stats.add(courses=1)
+    return course_id
 
 
 def main() -> None:
@@ -12,19 +170,66 @@ def main() -> None:
     parser.add_argument("--modules", type=int, default=3, help="Number of modules per course")
     parser.add_argument("--difficulty", default="Beginner", help="Difficulty level for all courses")
     parser.add_argument("--prerequisites", default="", help="Prerequisites text for all courses")
+    parser.add_argument(
+        "--parallel", type=int, default=1, help="Number of courses built at the same time"
+    )
+    parser.add_argument(
+        "--max-requests",
+        type=int,
+        default=2,
+        help="Maximum number of model requests in flight across all courses",
+    )
+    parser.add_argument(
+        "--session",
+        action="store_true",
+        help="Reuse each course's evaluated prompt prefix across its requests",
+    )
+    parser.add_argument(
+        "--state",
+        default=os.path.join(app.instance_path, "batch_state.json"),
+        help="Checkpoint file used to resume an interrupted run",
+    )
+    parser.add_argument(
+        "--fresh", action="store_true", help="Ignore any existing checkpoint file"
+    )
     args = parser.parse_args()
 
+    run = {
+        "topic": args.topic,
+        "courses": args.courses,
+        "modules": args.modules,
+        "difficulty": args.difficulty,
+        "prerequisites": args.prerequisites,
+    }
+    state = BatchState(args.state, run, fresh=args.fresh)
+    stats = Throughput()
+    set_llm_concurrency_limit(args.max_requests)
+
     with app.app_context():
         create_tables()
-        titles = generate_course_topics(args.topic, args.courses)
-        for title in titles:
-            course = create_course(
-                title,
-                module_count=args.modules,
-                difficulty=args.difficulty,
-                prerequisites=args.prerequisites,
-            )
-            print(f"Created course '{course.title}' (id {course.id})")
+    warm_up_llm()
+    if state.data["topics"] is None:
+        state.data["topics"] = generate_course_topics(args.topic, args.courses)
+        state.save()
+
+    with ThreadPoolExecutor(max_workers=max(1, args.parallel)) as pool:
+        futures = {
+            pool.submit(build_course, index, title, args, state, stats): title
+            for index, title in enumerate(state.data["topics"])
+        }
+        for future in as_completed(futures):
+            title = futures[future]
+            try:
+                course_id = future.result()
+                print(f"Created course '{title}' (id {course_id})")
+            except Exception as e:
+                stats.add(failed=1)
+                print(f"[ERROR] Course '{title}' failed, rerun to resume: {e}")
+
+    print(stats.summary())
+    if stats.failed:
+        raise SystemExit(1)
+    print(f"Batch complete. Checkpoint kept in {args.state}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,292 @@
+"""Benchmark the course and blog generation pipelines.
+
+By default the fake backend is used with a throwaway SQLite database, so the
+run needs no model and leaves the real data untouched:
+
+    python benchmark.py pipeline --courses 2 --modules 5 --concurrency 4
+    python benchmark.py routes --runs 5
+    python benchmark.py startup --budget-ms 600
+
+Set ``LLM_BACKEND``/``FAKE_LLM_*`` to change the backend or its latency
+profile, and ``--database`` to benchmark against a real database.
+``--stand-ins N`` starts N local stand-in Ollama servers and spreads the run
+over them with the pool backend:
+
+    python benchmark.py --stand-ins 3 --tps 20 pipeline --courses 3 --concurrency 6
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+def setup_environment(args) -> None:
+    """Configure the app before it is imported."""
+    os.environ.setdefault("LLM_BACKEND", "fake")
+    if args.latency is not None:
+        os.environ["FAKE_LLM_LATENCY"] = str(args.latency)
+    if args.tps is not None:
+        os.environ["FAKE_LLM_TPS"] = str(args.tps)
+    if args.stand_ins:
+        start_stand_ins(args.stand_ins)
+    # Cached answers would hide the generation cost being measured
+    os.environ["LLM_CACHE_DISABLE"] = "1"
+    if args.database:
+        os.environ["DATABASE_URL"] = args.database
+    else:
+        path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+
+def start_stand_ins(count: int, first_port: int = 11501) -> None:
+    """Serve ``count`` fake Ollama servers and point the pool backend at them."""
+    from llm_backends import serve_fake_ollama
+
+    hosts = []
+    for port in range(first_port, first_port + count):
+        server = serve_fake_ollama(port)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        hosts.append(f"127.0.0.1:{port}")
+    os.environ["LLM_BACKEND"] = "pool"
+    os.environ["OLLAMA_HOSTS"] = ",".join(hosts)
+
+
+def print_pool_stats() -> None:
+    from llm_backends import get_backend
+
+    backend = get_backend()
+    if hasattr(backend, "stats"):
+        for member in backend.stats():
+            print(
+                f"  {member['host']}: {member['served']} served, "
+                f"{member['failures']} failed"
+            )
+
+
+def percentile(values: list[float], pct: float) -> float:
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def describe(label: str, durations: list[float]) -> str:
+    if not durations:
+        return f"{label}: no runs"
+    return (
+        f"{label}: {len(durations)} run(s), mean {statistics.mean(durations):.2f}s, "
+        f"p50 {percentile(durations, 50):.2f}s, p95 {percentile(durations, 95):.2f}s"
+    )
+
+
+def run_pipeline(args) -> None:
+    from app import app, create_tables, create_course, generate_blog_post, set_setting
+
+    with app.app_context():
+        create_tables()
+        # Keep the blog pipeline off the network: an unreachable feed makes
+        # generate_blog_post fall back to a topic-only prompt immediately
+        set_setting("news_api_url", "http://127.0.0.1:9/")
+
+        started = time.time()
+        course_times = []
+        for i in range(args.courses):
+            t0 = time.time()
+            create_course(
+                f"Curso de prueba {i + 1}",
+                module_count=args.modules,
+                concurrency=args.concurrency,
+            )
+            course_times.append(time.time() - t0)
+
+        blog_times = []
+        for _ in range(args.blog_posts):
+            t0 = time.time()
+            generate_blog_post()
+            blog_times.append(time.time() - t0)
+        elapsed = time.time() - started
+
+    print(f"Backend: {os.environ['LLM_BACKEND']}, concurrency {args.concurrency}")
+    print(describe("Course", course_times))
+    print(describe("Blog post", blog_times))
+    print(f"Total: {elapsed:.2f}s")
+    if course_times:
+        print(f"  {len(course_times) / elapsed * 3600:.1f} courses/hour")
+    print_pool_stats()
+
+
+def run_routes(args) -> None:
+    """Time each routed purpose and how often its JSON answers parse as-is."""
+    from app import (
+        app,
+        create_tables,
+        generate_text,
+        get_llm_route,
+        parse_json_response,
+        iter_json_items,
+        _clean_title,
+        _clean_question,
+        section_titles_prompt,
+        course_topics_prompt,
+        quiz_prompt,
+        module_prompt,
+        overview_prompt,
+    )
+
+    topic = args.topic
+    # purpose -> (prompt, item cleaner for JSON answers, expected item count)
+    samples = {
+        "titles": (section_titles_prompt(topic, 5), _clean_title, 5),
+        "topics": (course_topics_prompt(topic, 3), _clean_title, 3),
+        "quiz": (quiz_prompt(topic, 10), _clean_question, 10),
+        "overview": (overview_prompt(topic), None, 0),
+        "module": (module_prompt(topic, f"Introducción a {topic}"), None, 0),
+    }
+    purposes = args.purposes or list(samples)
+
+    with app.app_context():
+        create_tables()
+        print(f"Backend: {os.environ['LLM_BACKEND']}, {args.runs} run(s) per route")
+        for purpose in purposes:
+            if purpose not in samples:
+                print(f"{purpose}: unknown purpose")
+                continue
+            prompt, clean, expected = samples[purpose]
+            durations = []
+            valid = salvaged = 0
+            for _ in range(args.runs):
+                t0 = time.time()
+                text = generate_text(prompt, purpose=purpose, use_cache=False)
+                durations.append(time.time() - t0)
+                if clean is None:
+                    continue
+                parsed = parse_json_response(text)
+                if isinstance(parsed, list):
+                    items = [clean(item) for item in parsed]
+                    if len([item for item in items if item]) >= expected:
+                        valid += 1
+                items = [item for item in map(clean, iter_json_items(text)) if item]
+                if len(items) >= expected:
+                    salvaged += 1
+            route = get_llm_route(purpose)
+            line = describe(f"{purpose} [{route['model']}]", durations)
+            if clean is not None and durations:
+                line += (
+                    f", valid JSON {valid / len(durations):.0%}"
+                    f", complete after salvage {salvaged / len(durations):.0%}"
+                )
+            print(line)
+
+
+# Imported on first use by app.py; loading any of them at startup is a regression
+LAZY_MODULES = ("reportlab", "stripe", "cryptography", "markdown", "bs4", "requests")
+
+
+def import_times(module: str) -> list[tuple[str, int, int]]:
+    """Import ``module`` in a fresh interpreter with ``-X importtime``.
+
+    Returns ``(name, depth, cumulative microseconds)`` for every import.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode:
+        raise SystemExit(f"import {module} failed:\n{result.stderr[-2000:]}")
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((name.strip(), depth, int(cumulative)))
+    return imports
+
+
+def run_startup(args) -> None:
+    """Time ``import app`` in fresh interpreters and check the budget."""
+    totals = []
+    for _ in range(args.runs):
+        imports = import_times(args.module)
+        # Children are reported before their parent, one level deeper
+        end = next(
+            i for i, (name, depth, _) in enumerate(imports)
+            if name == args.module and depth == 0
+        )
+        start = end
+        while start > 0 and imports[start - 1][1] > 0:
+            start -= 1
+        totals.append(imports[end][2] / 1000)
+    median = statistics.median(totals)
+    print(
+        f"import {args.module}: {len(totals)} run(s), "
+        f"min {min(totals):.0f}ms, median {median:.0f}ms (budget {args.budget_ms:.0f}ms)"
+    )
+    print(f"Slowest imports made by {args.module} in the last run:")
+    direct = [i for i in imports[start:end] if i[1] == 1]
+    top = sorted(direct, key=lambda i: i[2], reverse=True)
+    for name, _, us in top[: args.top]:
+        print(f"  {us / 1000:7.1f}ms  {name}")
+
+    names = {name.split(".")[0] for name, _, _ in imports[start:end]}
+    eager = [module for module in LAZY_MODULES if module in names]
+    if eager:
+        print(f"Loaded at startup but meant to be lazy: {', '.join(eager)}")
+    if median > args.budget_ms:
+        print(f"Startup over budget by {median - args.budget_ms:.0f}ms")
+    if eager or median > args.budget_ms:
+        raise SystemExit(1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", help="Database URL (default: temporary SQLite)")
+    parser.add_argument("--latency", type=float, help="Fake backend time to first token")
+    parser.add_argument("--tps", type=float, help="Fake backend tokens per second")
+    parser.add_argument(
+        "--stand-ins", type=int, default=0, help="Local stand-in Ollama servers to pool"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    pipeline = sub.add_parser("pipeline", help="Time create_course and generate_blog_post")
+    pipeline.add_argument("--courses", type=int, default=2)
+    pipeline.add_argument("--modules", type=int, default=3)
+    pipeline.add_argument("--concurrency", type=int, default=1)
+    pipeline.add_argument("--blog-posts", type=int, default=2)
+    pipeline.set_defaults(func=run_pipeline)
+
+    routes = sub.add_parser(
+        "routes", help="Latency and JSON validity of each model route"
+    )
+    routes.add_argument("--runs", type=int, default=3)
+    routes.add_argument("--topic", default="Liderazgo")
+    routes.add_argument(
+        "--purposes", nargs="+", help="Purposes to measure (default: all)"
+    )
+    routes.set_defaults(func=run_routes)
+
+    startup = sub.add_parser(
+        "startup", help="Import time of the app in fresh interpreters"
+    )
+    startup.add_argument("--runs", type=int, default=5)
+    startup.add_argument("--module", default="app", help="Module to import")
+    startup.add_argument(
+        "--budget-ms", type=float, default=600, help="Fail when the median is slower"
+    )
+    startup.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    startup.set_defaults(func=run_startup)
+
+    args = parser.parse_args()
+    setup_environment(args)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,14 @@
 """Script to generate a daily blog post using the local Llama 3 model."""
 
 import datetime
-from app import db, BlogPost, generate_blog_post
+from app import (
+    db,
+    BlogPost,
+    generate_blog_post,
+    refresh_blog_archive_months,
+    store_rendered_html,
+    warm_up_llm,
+)
 
 
 def create_daily_posts(count: int = 2):
@@ -16,12 +23,16 @@ def create_daily_posts(count: int = 2):
         return
     
     posts_to_create = count - existing_posts_today
+    # Load the model only when a post will be generated
+    warm_up_llm()
     for _ in range(posts_to_create):
-        title, content = generate_blog_post()
-        post = BlogPost(title=title, content=content)
+        title, content, source_title = generate_blog_post()
+        post = BlogPost(title=title, content=content, source_title=source_title)
+        store_rendered_html(post)
         db.session.add(post)
         db.session.commit()
         print(f"Generated post: {title}")
+    refresh_blog_archive_months()
 
 
 if __name__ == "__main__":
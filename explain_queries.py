@@ -0,0 +1,128 @@
+"""Check that the main page queries use indexes.
+
+Runs EXPLAIN (EXPLAIN QUERY PLAN on SQLite) for the queries behind the busiest
+routes and flags every step that reads a whole table. Exits with status 1 when
+a full scan is found, so it can run after schema changes:
+
+    python explain_queries.py
+"""
+import argparse
+import datetime
+
+from app import (
+    app,
+    db,
+    create_tables,
+    BlogPost,
+    Course,
+    CourseProgress,
+    CourseSection,
+    Enrollment,
+    NewsItem,
+    QuizQuestion,
+    SectionProgress,
+    User,
+)
+
+
+def route_queries() -> dict:
+    """Representative statements keyed by the route or helper issuing them."""
+    return {
+        "courses: company catalog": db.select(Course).where(
+            (Course.company_id == None) | (Course.company_id == 1)  # noqa: E711
+        ),
+        "courses: progress rows": db.select(CourseProgress).where(
+            CourseProgress.user_id == 1, CourseProgress.course_id.in_([1, 2, 3])
+        ),
+        "courses: enrollments": db.select(Enrollment.course_id, Enrollment.paid).where(
+            Enrollment.user_id == 1, Enrollment.course_id.in_([1, 2, 3])
+        ),
+        "course_detail: sections": db.select(CourseSection)
+        .where(CourseSection.course_id == 1)
+        .order_by(CourseSection.order),
+        "course_detail: completed sections": db.select(SectionProgress.section_id)
+        .join(CourseSection, SectionProgress.section_id == CourseSection.id)
+        .where(SectionProgress.user_id == 1, CourseSection.course_id == 1),
+        "course_quiz: questions": db.select(QuizQuestion)
+        .where(QuizQuestion.course_id == 1)
+        .order_by(QuizQuestion.order),
+        "company_admin: course enrollments": db.select(Enrollment).where(
+            Enrollment.course_id == 1
+        ),
+        "company_admin: company users": db.select(User).where(User.company_id == 1),
+        "reset_password: token lookup": db.select(User).where(User.reset_token == "x"),
+        "blog: latest posts": db.select(BlogPost)
+        .order_by(BlogPost.created_at.desc(), BlogPost.id.desc())
+        .limit(11),
+        "blog: page after cursor": db.select(BlogPost)
+        .where(
+            db.or_(
+                BlogPost.created_at < datetime.datetime(2024, 1, 1),
+                db.and_(
+                    BlogPost.created_at == datetime.datetime(2024, 1, 1),
+                    BlogPost.id < 100,
+                ),
+            )
+        )
+        .order_by(BlogPost.created_at.desc(), BlogPost.id.desc())
+        .limit(11),
+        "refresh_blog_archive_months: posts per month": db.select(
+            db.extract("year", BlogPost.created_at),
+            db.extract("month", BlogPost.created_at),
+            db.func.count(BlogPost.id),
+        ).group_by(
+            db.extract("year", BlogPost.created_at),
+            db.extract("month", BlogPost.created_at),
+        ),
+        "fetch_news_items: by url": db.select(NewsItem).where(NewsItem.url == "x"),
+        "news: latest items": db.select(NewsItem)
+        .order_by(NewsItem.created_at.desc())
+        .limit(25),
+    }
+
+
+def explain(statement) -> list[tuple[str, bool]]:
+    """Return ``(plan step, is full scan)`` pairs for ``statement``."""
+    dialect = db.engine.dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "sqlite":
+        rows = db.session.execute(db.text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        steps = []
+        for row in rows:
+            detail = row[-1]
+            full_scan = detail.startswith("SCAN ") and " USING " not in detail
+            steps.append((detail, full_scan))
+        return steps
+    rows = db.session.execute(db.text(f"EXPLAIN {sql}")).mappings().all()
+    return [
+        (
+            f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']}",
+            row["type"] == "ALL",
+        )
+        for row in rows
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--verbose", action="store_true", help="Print every plan step")
+    args = parser.parse_args()
+
+    full_scans = 0
+    with app.app_context():
+        create_tables()
+        for name, statement in route_queries().items():
+            steps = explain(statement)
+            flagged = [detail for detail, full_scan in steps if full_scan]
+            full_scans += len(flagged)
+            print(f"{'FULL SCAN' if flagged else 'ok':9} {name}")
+            for detail, full_scan in steps:
+                if full_scan or args.verbose:
+                    print(f"          {detail}")
+    if full_scans:
+        print(f"{full_scans} full table scan(s) found")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
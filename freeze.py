@@ -14,7 +14,15 @@ except ImportError:
     subprocess.run([sys.executable, "-m", "pip", "install", "-r", req_file], check=True)
     from flask_frozen import Freezer
 
-from app import app, Course, CourseSection, QuizQuestion, create_tables
+from app import (
+    app,
+    Course,
+    CourseSection,
+    QuizQuestion,
+    blog_archive_months,
+    blog_page_cursors,
+    create_tables,
+)
 
 import re
 import shutil
@@ -63,6 +71,19 @@ def course_quiz():
     for course in Course.query.all():
         yield {'course_id': course.id}
 
+
+@freezer.register_generator
+def blog():
+    # Every page of the blog and of each monthly archive, BLOG_PAGE_SIZE
+    # posts per page
+    yield {}
+    for cursor in blog_page_cursors():
+        yield {'cursor': cursor}
+    for year, month, _ in blog_archive_months():
+        yield {'year': year, 'month': month}
+        for cursor in blog_page_cursors(year, month):
+            yield {'year': year, 'month': month, 'cursor': cursor}
+
 if __name__ == '__main__':
     with app.app_context():
         create_tables()
@@ -0,0 +1,702 @@
+"""Text generation backends used by ``generate_text``.
+
+Every backend exposes ``chat(model, messages, options=None, timeout=None)``
+and ``generate(model, prompt, system=None, context=None, options=None,
+timeout=None)`` and yields chunks shaped like ``{"content": str, "done": bool}``. The final chunk
+may also carry ``prompt_eval_count`` and ``eval_count`` token counts, a
+``done_reason`` (``"length"`` when ``num_predict`` was reached) and, for
+``generate`` on Ollama, the evaluated ``context`` that a later call can resume
+from. ``timeout`` (seconds) bounds every wait for the server, including the
+wait for the first token; the request raises when it passes. Ollama clients
+are shared to keep their connections open, so they use a fixed read timeout
+(``OLLAMA_READ_TIMEOUT``, default 300 seconds) instead.
+
+The backend is chosen with the ``LLM_BACKEND`` environment variable:
+
+- ``ollama`` (default): a local or remote Ollama server (``OLLAMA_HOST``,
+  ``OLLAMA_KEEP_ALIVE``).
+- ``pool``: several Ollama servers (``OLLAMA_HOSTS``) with load balancing,
+  health checks and failover.
+- ``openai``: any OpenAI-compatible ``/v1/chat/completions`` endpoint
+  (``OPENAI_BASE_URL``, ``OPENAI_API_KEY``), e.g. vLLM or llama.cpp.
+- ``fake``: in-process generator with configurable latency and speed
+  (``FAKE_LLM_LATENCY``, ``FAKE_LLM_TPS``, ``FAKE_LLM_TOKENS``) for
+  benchmarks and load tests on machines without a model.
+
+``python llm_backends.py serve --port 11435`` starts a stand-in Ollama server
+answering with the fake backend, to exercise the ``ollama`` and ``pool``
+backends locally.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ChatBackend:
+    """Base for backends whose only primitive is a chat request."""
+
+    def generate(
+        self,
+        model: str,
+        prompt: str,
+        system: str | None = None,
+        context: list[int] | None = None,
+        options: dict | None = None,
+        timeout: float | None = None,
+    ):
+        """Chat with an optional system prefix. ``context`` is not supported
+        and ignored; servers with prefix caching reuse the shared system
+        prompt instead."""
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({"role": "user", "content": prompt})
+        return self.chat(model, messages, options, timeout)
+
+
+class OllamaBackend(ChatBackend):
+    """Ollama server reached through one shared client.
+
+    The client keeps its HTTP connections open between calls, and every
+    request asks the server to keep the model loaded for ``keep_alive``
+    (``OLLAMA_KEEP_ALIVE``, default 30 minutes) so a pipeline does not pay
+    the model load time again between steps. The client gives up when the
+    server sends nothing for ``OLLAMA_READ_TIMEOUT`` seconds, e.g. while it
+    hangs before the first token; the per-call ``timeout`` is not used.
+    """
+
+    name = "ollama"
+
+    def __init__(self, host: str | None = None, keep_alive: str | None = None):
+        self.host = host or os.environ.get("OLLAMA_HOST")
+        self.keep_alive = keep_alive or os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+        self.read_timeout = float(os.environ.get("OLLAMA_READ_TIMEOUT", "300"))
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._client_lock:
+            if self._client is None:
+                import ollama
+
+                self._client = ollama.Client(host=self.host, timeout=self.read_timeout)
+            return self._client
+
+    def warm_up(self, model: str) -> None:
+        """Load ``model`` into memory without generating anything."""
+        self.client.generate(model=model, prompt="", keep_alive=self.keep_alive)
+
+    def chat(
+        self,
+        model: str,
+        messages: list[dict],
+        options: dict | None = None,
+        timeout: float | None = None,
+    ):
+        stream = self.client.chat(
+            model=model,
+            messages=messages,
+            options=options or None,
+            stream=True,
+            keep_alive=self.keep_alive,
+        )
+        try:
+            for chunk in stream:
+                yield {
+                    "content": chunk["message"]["content"],
+                    "done": bool(chunk.get("done")),
+                    "done_reason": chunk.get("done_reason"),
+                    "prompt_eval_count": chunk.get("prompt_eval_count"),
+                    "eval_count": chunk.get("eval_count"),
+                }
+        finally:
+            close = getattr(stream, "close", None)
+            if close:
+                close()
+
+    def generate(
+        self,
+        model: str,
+        prompt: str,
+        system: str | None = None,
+        context: list[int] | None = None,
+        options: dict | None = None,
+        timeout: float | None = None,
+    ):
+        """Completion that resumes from an earlier call's ``context``.
+
+        Tokens already in ``context`` are not evaluated again when the server
+        still holds them, so only ``prompt`` costs prompt evaluation.
+        """
+        stream = self.client.generate(
+            model=model,
+            prompt=prompt,
+            # The system prompt is already part of a resumed context
+            system=None if context else system,
+            context=context,
+            options=options or None,
+            stream=True,
+            keep_alive=self.keep_alive,
+        )
+        try:
+            for chunk in stream:
+                yield {
+                    "content": chunk["response"],
+                    "done": bool(chunk.get("done")),
+                    "done_reason": chunk.get("done_reason"),
+                    "prompt_eval_count": chunk.get("prompt_eval_count"),
+                    "eval_count": chunk.get("eval_count"),
+                    "context": chunk.get("context"),
+                }
+        finally:
+            close = getattr(stream, "close", None)
+            if close:
+                close()
+
+
+def parse_hosts(value: str) -> list[tuple[str, float]]:
+    """Parse ``OLLAMA_HOSTS``: comma separated hosts, each optionally
+    followed by ``*weight`` (e.g. ``box1:11434,box2:11434*2``)."""
+    hosts = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, weight = item.partition("*")
+        hosts.append((host.strip(), float(weight) if weight else 1.0))
+    return hosts
+
+
+class PoolMember:
+    """One Ollama server of a ``PoolBackend`` and its counters."""
+
+    def __init__(self, host: str, weight: float = 1.0, keep_alive: str | None = None):
+        self.host = host
+        self.url = (host if "://" in host else f"http://{host}").rstrip("/")
+        self.weight = weight if weight > 0 else 1.0
+        self.backend = OllamaBackend(host, keep_alive)
+        self.outstanding = 0
+        self.served = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+
+    def available(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def to_dict(self) -> dict:
+        return {
+            "host": self.host,
+            "weight": self.weight,
+            "outstanding": self.outstanding,
+            "served": self.served,
+            "failures": self.failures,
+            "healthy": self.available(time.monotonic()),
+        }
+
+
+class PoolBackend(ChatBackend):
+    """Spread requests over several Ollama servers.
+
+    Each request goes to the healthy host with the fewest requests in flight
+    relative to its weight. A host whose request fails is ejected for
+    ``eject_seconds`` (``OLLAMA_EJECT_SECONDS``, default 30) and the request
+    is retried on another host, as long as no output was streamed yet. A
+    background thread polls ``/api/version`` on every host each
+    ``health_interval`` seconds (``OLLAMA_HEALTH_INTERVAL``, default 15) to
+    eject dead hosts before a request hits them and to bring recovered
+    hosts back.
+    """
+
+    name = "pool"
+
+    def __init__(
+        self,
+        hosts: list[tuple[str, float]] | None = None,
+        keep_alive: str | None = None,
+        eject_seconds: float | None = None,
+        health_interval: float | None = None,
+    ):
+        hosts = hosts or parse_hosts(os.environ.get("OLLAMA_HOSTS", ""))
+        if not hosts:
+            raise ValueError("The pool backend needs OLLAMA_HOSTS")
+        self.members = [PoolMember(host, weight, keep_alive) for host, weight in hosts]
+        self.eject_seconds = float(
+            eject_seconds
+            if eject_seconds is not None
+            else os.environ.get("OLLAMA_EJECT_SECONDS", "30")
+        )
+        self.health_interval = float(
+            health_interval
+            if health_interval is not None
+            else os.environ.get("OLLAMA_HEALTH_INTERVAL", "15")
+        )
+        self._lock = threading.Lock()
+        self._next = 0
+        self._health_thread = None
+        self._http = None
+
+    @property
+    def http(self):
+        if self._http is None:
+            import requests
+
+            self._http = requests.Session()
+        return self._http
+
+    def stats(self) -> list[dict]:
+        with self._lock:
+            return [member.to_dict() for member in self.members]
+
+    def _eject(self, member: PoolMember) -> None:
+        member.ejected_until = time.monotonic() + self.eject_seconds
+
+    def check_health(self) -> None:
+        """Probe every host once, ejecting the unreachable ones."""
+        import requests
+
+        for member in self.members:
+            try:
+                self.http.get(f"{member.url}/api/version", timeout=2).raise_for_status()
+                alive = True
+            except requests.RequestException:
+                alive = False
+            with self._lock:
+                if alive:
+                    member.ejected_until = 0.0
+                elif member.available(time.monotonic()):
+                    print(f"[WARN] Ollama host {member.host} is down, ejecting it")
+                    self._eject(member)
+
+    def _health_loop(self) -> None:
+        while True:
+            self.check_health()
+            time.sleep(self.health_interval)
+
+    def _start_health_checks(self) -> None:
+        if self._health_thread is None and self.health_interval > 0:
+            self._health_thread = threading.Thread(target=self._health_loop, daemon=True)
+            self._health_thread.start()
+
+    def _acquire(self, tried: list[PoolMember]) -> PoolMember | None:
+        with self._lock:
+            self._start_health_checks()
+            now = time.monotonic()
+            candidates = [m for m in self.members if m not in tried]
+            if not candidates:
+                return None
+            # With every remaining host ejected, still try the one that
+            # recovers first rather than failing outright
+            healthy = [m for m in candidates if m.available(now)] or [
+                min(candidates, key=lambda m: m.ejected_until)
+            ]
+            # Rotate the starting point so ties do not always pick the first host
+            self._next = (self._next + 1) % len(self.members)
+            member = min(
+                healthy,
+                key=lambda m: (
+                    (m.outstanding + 1) / m.weight,
+                    (self.members.index(m) - self._next) % len(self.members),
+                ),
+            )
+            member.outstanding += 1
+            return member
+
+    def _release(self, member: PoolMember, error: Exception | None) -> None:
+        with self._lock:
+            member.outstanding -= 1
+            if error is None:
+                member.served += 1
+            else:
+                member.failures += 1
+                self._eject(member)
+
+    def _stream(self, call, timeout: float | None = None):
+        tried: list[PoolMember] = []
+        last_error = None
+        expires = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            member = self._acquire(tried)
+            if member is None:
+                raise last_error
+            tried.append(member)
+            streamed = False
+            error = None
+            # Retries share the caller's time budget
+            remaining = max(0.0, expires - time.monotonic()) if expires else None
+            stream = call(member.backend, remaining)
+            try:
+                for chunk in stream:
+                    streamed = True
+                    yield chunk
+            except Exception as e:
+                error = e
+            finally:
+                stream.close()
+                # A request that ran out of time is not the host's fault
+                out_of_time = expires is not None and time.monotonic() >= expires
+                self._release(member, None if out_of_time else error)
+            if error is None:
+                return
+            # Output already handed to the caller cannot be replayed
+            if streamed or out_of_time:
+                raise error
+            print(f"[WARN] Ollama host {member.host} failed, trying another host: {error}")
+            last_error = error
+
+    def warm_up(self, model: str) -> None:
+        """Load ``model`` on every host, ejecting the ones that fail."""
+        for member in self.members:
+            try:
+                member.backend.warm_up(model)
+            except Exception as e:
+                print(f"[WARN] warm_up failed on {member.host}: {e}")
+                with self._lock:
+                    self._eject(member)
+
+    def chat(
+        self,
+        model: str,
+        messages: list[dict],
+        options: dict | None = None,
+        timeout: float | None = None,
+    ):
+        return self._stream(
+            lambda backend, remaining: backend.chat(model, messages, options, remaining),
+            timeout,
+        )
+
+    def generate(
+        self,
+        model: str,
+        prompt: str,
+        system: str | None = None,
+        context: list[int] | None = None,
+        options: dict | None = None,
+        timeout: float | None = None,
+    ):
+        # Context tokens depend only on the model, so any host can resume them
+        return self._stream(
+            lambda backend, remaining: backend.generate(
+                model, prompt, system, context, options, remaining
+            ),
+            timeout,
+        )
+
+
+class OpenAIBackend(ChatBackend):
+    """Client for servers implementing the OpenAI chat completions API."""
+
+    name = "openai"
+
+    def __init__(self, base_url: str | None = None, api_key: str | None = None):
+        self.base_url = (
+            base_url or os.environ.get("OPENAI_BASE_URL", "http://localhost:8000/v1")
+        ).rstrip("/")
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY", "")
+        import requests
+
+        self.session = requests.Session()
+
+    def warm_up(self, model: str) -> None:
+        """OpenAI-compatible servers keep their model loaded."""
+
+    def chat(
+        self,
+        model: str,
+        messages: list[dict],
+        options: dict | None = None,
+        timeout: float | None = None,
+    ):
+        options = options or {}
+        body = {
+            "model": model,
+            "messages": messages,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+        # Map the Ollama option names used across the app
+        if "temperature" in options:
+            body["temperature"] = options["temperature"]
+        if "num_predict" in options:
+            body["max_tokens"] = options["num_predict"]
+        if "stop" in options:
+            body["stop"] = options["stop"]
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        with self.session.post(
+            f"{self.base_url}/chat/completions",
+            json=body,
+            headers=headers,
+            stream=True,
+            timeout=(min(10, timeout), timeout) if timeout is not None else (10, 600),
+        ) as resp:
+            resp.raise_for_status()
+            finish_reason = None
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                usage = event.get("usage") or {}
+                choices = event.get("choices") or [{}]
+                finish_reason = choices[0].get("finish_reason") or finish_reason
+                yield {
+                    "content": (choices[0].get("delta") or {}).get("content") or "",
+                    "done": bool(usage) or finish_reason is not None,
+                    "done_reason": finish_reason,
+                    "prompt_eval_count": usage.get("prompt_tokens"),
+                    "eval_count": usage.get("completion_tokens"),
+                }
+
+
+_FAKE_WORDS = (
+    "liderazgo equipo talento cultura organización desarrollo objetivos "
+    "comunicación evaluación desempeño estrategia personas procesos "
+    "competencias aprendizaje retroalimentación motivación"
+).split()
+
+
+class FakeBackend(ChatBackend):
+    """Deterministic stand-in for a model server.
+
+    Answers are derived from the prompt so repeated runs match: prompts asking
+    for quiz questions get a JSON list of question objects, other JSON prompts
+    get a list of strings, and everything else gets HTML text. ``latency`` is
+    the time to the first token and ``tokens_per_second`` the streaming rate.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        latency: float | None = None,
+        tokens_per_second: float | None = None,
+        tokens: int | None = None,
+    ):
+        self.latency = float(
+            latency if latency is not None else os.environ.get("FAKE_LLM_LATENCY", "0.2")
+        )
+        self.tokens_per_second = float(
+            tokens_per_second
+            if tokens_per_second is not None
+            else os.environ.get("FAKE_LLM_TPS", "200")
+        )
+        self.tokens = int(
+            tokens if tokens is not None else os.environ.get("FAKE_LLM_TOKENS", "300")
+        )
+
+    def respond(self, prompt: str) -> str:
+        """Return the full answer the fake model gives to ``prompt``."""
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+        match = re.search(r"\b(\d+)\b", prompt)
+        count = int(match.group(1)) if match else 3
+        words = lambda n: " ".join(rng.choice(_FAKE_WORDS) for _ in range(n))
+        if "'question'" in prompt:
+            return json.dumps(
+                [
+                    {
+                        "question": f"¿{words(8).capitalize()}?",
+                        "a": words(3),
+                        "b": words(3),
+                        "c": words(3),
+                        "d": words(3),
+                        "answer": rng.choice("ABCD"),
+                    }
+                    for _ in range(count)
+                ],
+                ensure_ascii=False,
+            )
+        if "JSON" in prompt:
+            return json.dumps(
+                [words(4).capitalize() for _ in range(count)], ensure_ascii=False
+            )
+        paragraphs = []
+        remaining = self.tokens
+        while remaining > 0:
+            size = min(remaining, 60)
+            paragraphs.append(f"<p>{words(size).capitalize()}.</p>")
+            remaining -= size
+        return f"{words(5).capitalize()}\n<h2>Introducción</h2>\n" + "\n".join(paragraphs)
+
+    def warm_up(self, model: str) -> None:
+        time.sleep(self.latency)
+
+    def chat(
+        self,
+        model: str,
+        messages: list[dict],
+        options: dict | None = None,
+        timeout: float | None = None,
+    ):
+        prompt = "\n".join(m["content"] for m in messages)
+        answer = self.respond(prompt)
+        # Split on whitespace boundaries so each chunk is roughly one token
+        options = options or {}
+        for stop in options.get("stop") or ():
+            if stop in answer:
+                answer = answer[: answer.index(stop)]
+        pieces = re.findall(r"\S+\s*|\s+", answer)
+        limit = options.get("num_predict")
+        done_reason = "stop"
+        if limit and len(pieces) > limit:
+            pieces = pieces[:limit]
+            done_reason = "length"
+        if timeout is not None and self.latency > timeout:
+            # Like a server still loading the model when the client gives up
+            time.sleep(timeout)
+            raise TimeoutError(f"no answer within {timeout:.1f}s")
+        time.sleep(self.latency)
+        delay = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        for piece in pieces:
+            if delay:
+                time.sleep(delay)
+            yield {"content": piece, "done": False}
+        yield {
+            "content": "",
+            "done": True,
+            "done_reason": done_reason,
+            "prompt_eval_count": len(prompt.split()),
+            "eval_count": len(pieces),
+        }
+
+
+BACKENDS = {
+    "ollama": OllamaBackend,
+    "pool": PoolBackend,
+    "openai": OpenAIBackend,
+    "fake": FakeBackend,
+}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_backend(name: str | None = None):
+    """Return the shared instance of the backend ``name`` (or ``LLM_BACKEND``)."""
+    name = name or os.environ.get("LLM_BACKEND", "ollama")
+    with _instances_lock:
+        if name not in _instances:
+            if name not in BACKENDS:
+                raise ValueError(f"Unknown LLM backend: {name}")
+            _instances[name] = BACKENDS[name]()
+        return _instances[name]
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Minimal Ollama HTTP API answering from ``server.backend``."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, data: dict) -> None:
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            self.send_json({"version": "0.0.0-fake"})
+        elif self.path == "/api/tags":
+            self.send_json({"models": []})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if self.path not in ("/api/chat", "/api/generate"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        backend = self.server.backend
+        if self.path == "/api/chat":
+            messages = body.get("messages") or []
+        else:
+            messages = [{"role": "user", "content": body.get("prompt", "")}]
+            if body.get("system"):
+                messages.insert(0, {"role": "system", "content": body["system"]})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        if not messages[-1]["content"]:
+            # A warm-up request only loads the model
+            self.write_chunks(body, [{"content": "", "done": True}])
+            return
+        # Like a GPU box, only ``parallel`` generations run at once
+        with self.server.slots:
+            self.write_chunks(
+                body, backend.chat(body.get("model"), messages, body.get("options"))
+            )
+
+    def write_chunks(self, body: dict, chunks) -> None:
+        for chunk in chunks:
+            event = {
+                "model": body.get("model"),
+                "created_at": "1970-01-01T00:00:00Z",
+                "done": chunk["done"],
+            }
+            if self.path == "/api/chat":
+                event["message"] = {"role": "assistant", "content": chunk["content"]}
+            else:
+                event["response"] = chunk["content"]
+            if chunk["done"]:
+                event["done_reason"] = chunk.get("done_reason")
+                event["prompt_eval_count"] = chunk.get("prompt_eval_count")
+                event["eval_count"] = chunk.get("eval_count")
+                if self.path == "/api/generate":
+                    event["context"] = list(body.get("context") or []) + list(
+                        range(chunk.get("prompt_eval_count") or 0)
+                    )
+            self.wfile.write((json.dumps(event) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+def serve_fake_ollama(
+    port: int,
+    backend: FakeBackend | None = None,
+    parallel: int = 1,
+    host: str = "127.0.0.1",
+):
+    """Return a stand-in Ollama server on ``port``; call ``serve_forever``.
+
+    ``parallel`` is the number of requests it generates at once
+    (``OLLAMA_NUM_PARALLEL`` on a real server); the rest wait their turn.
+    """
+    server = ThreadingHTTPServer((host, port), FakeOllamaHandler)
+    server.daemon_threads = True
+    server.backend = backend or FakeBackend()
+    server.slots = threading.BoundedSemaphore(max(1, parallel))
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="LLM backend utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="Run a stand-in Ollama server")
+    serve.add_argument("--port", type=int, default=11435)
+    serve.add_argument("--latency", type=float, help="Seconds to the first token")
+    serve.add_argument("--tps", type=float, help="Tokens per second")
+    serve.add_argument(
+        "--parallel", type=int, default=1, help="Requests generated at the same time"
+    )
+    args = parser.parse_args()
+
+    server = serve_fake_ollama(
+        args.port, FakeBackend(args.latency, args.tps), parallel=args.parallel
+    )
+    print(f"Fake Ollama listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
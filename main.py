@@ -1,4 +1,6 @@
-import ollama
+import os
+
+from llm_backends import get_backend
 
 # Define the persona for the AI model
 system_prompt = (
@@ -8,19 +10,19 @@ system_prompt = (
     "you are here to offer advice and explanations."
 )
 
-stream = ollama.chat(
-    model="llama3:8b",
-    messages=[
+# The backend comes from LLM_BACKEND (Ollama unless configured otherwise)
+stream = get_backend().chat(
+    os.environ.get("LLM_MODEL", "llama3:8b"),
+    [
         {"role": "system", "content": system_prompt},
         {
             "role": "user",
             "content": "Rabbi, what is the meaning of Shabbat and why is it so important?",
         },
     ],
-    stream=True,
 )
 
 for chunk in stream:
-    print(chunk["message"]["content"], end="", flush=True)
+    print(chunk["content"], end="", flush=True)
 
 print()  # newline for clean output
@@ -0,0 +1,23 @@
+"""Recompute the course progress summaries from the completed sections.
+
+The summaries are kept up to date as users complete sections; run this after
+editing progress rows by hand or restoring a backup.
+"""
+import argparse
+
+from app import app, create_tables, rebuild_course_progress
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--course", type=int, help="Only rebuild this course id")
+    args = parser.parse_args()
+
+    with app.app_context():
+        create_tables()
+        rows = rebuild_course_progress(args.course)
+    print(f"Rebuilt progress for {rows} user/course pair(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""Render the stored HTML of blog posts, courses, sections and pages.
+
+Text saved through the site is rendered when it is written; run this after
+changing Markdown rows by hand or the Markdown rendering itself (``--force``).
+"""
+import argparse
+
+from app import app, create_tables, render_stored_html
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--force", action="store_true", help="Render every row, even unchanged ones"
+    )
+    args = parser.parse_args()
+
+    with app.app_context():
+        create_tables()
+        rendered = render_stored_html(force=args.force)
+    print(f"Rendered {rendered} stored text(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Near-duplicate detection for news headlines and blog topics.
+
+Texts are reduced to sets of accent-folded words without stopwords. MinHash
+signatures split into LSH bands find candidate matches without comparing
+every pair; candidates are then confirmed with the exact Jaccard similarity
+of their word sets.
+"""
+import hashlib
+import random
+import re
+import unicodedata
+
+STOPWORDS = set(
+    (
+        "a al ante con como contra de del desde durante e el en entre es esta este "
+        "esto fue ha han hasta la las le les lo los mas muy no o para pero por que "
+        "se segun ser si sin sobre son su sus tras un una unas uno unos y ya "
+        "an and are as at be by for from has have in is it its of on or that the "
+        "this to was were will with"
+    ).split()
+)
+
+_PRIME = (1 << 61) - 1
+
+
+def words(text: str) -> set[str]:
+    """Return the set of significant words in ``text`` (HTML is ignored)."""
+    text = re.sub(r"<[^>]+>", " ", text or "")
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return {w for w in re.findall(r"[a-z0-9]+", text) if w not in STOPWORDS}
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _hash(word: str) -> int:
+    return int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class MinHashIndex:
+    """In-memory index answering "which stored text is close to this one?".
+
+    ``threshold`` is the minimum Jaccard similarity of two word sets to count
+    as near duplicates. The signature has ``bands * rows`` values; two rows
+    per band keeps recall high for short headlines at thresholds around 0.5.
+    """
+
+    def __init__(self, threshold: float = 0.6, bands: int = 32, rows: int = 2):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        rng = random.Random(1)
+        self._perms = [
+            (rng.randrange(1, _PRIME), rng.randrange(0, _PRIME))
+            for _ in range(bands * rows)
+        ]
+        self._buckets: dict[tuple, list[int]] = {}
+        self._entries: list[tuple[object, set[str]]] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def signature(self, tokens: set[str]) -> list[int]:
+        hashes = [_hash(t) for t in tokens]
+        return [min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms]
+
+    def _bands(self, tokens: set[str]):
+        sig = self.signature(tokens)
+        for band in range(self.bands):
+            yield (band, *sig[band * self.rows : (band + 1) * self.rows])
+
+    def add(self, key, text: str) -> None:
+        """Store ``text`` under ``key``; texts without words are ignored."""
+        tokens = words(text)
+        if not tokens:
+            return
+        position = len(self._entries)
+        self._entries.append((key, tokens))
+        for band in self._bands(tokens):
+            self._buckets.setdefault(band, []).append(position)
+
+    def query(self, text: str) -> list[tuple[object, float]]:
+        """Return ``(key, similarity)`` of stored texts at or above the
+        threshold, most similar first."""
+        tokens = words(text)
+        if not tokens:
+            return []
+        candidates = set()
+        for band in self._bands(tokens):
+            candidates.update(self._buckets.get(band, ()))
+        matches = []
+        for position in candidates:
+            key, other = self._entries[position]
+            score = jaccard(tokens, other)
+            if score >= self.threshold:
+                matches.append((key, score))
+        matches.sort(key=lambda match: match[1], reverse=True)
+        return matches
+
+    def find(self, text: str):
+        """Return the key of the closest near duplicate of ``text`` or ``None``."""
+        matches = self.query(text)
+        return matches[0][0] if matches else None
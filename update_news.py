@@ -1,38 +1,18 @@
 import os
 from dotenv import load_dotenv
 load_dotenv()
-import requests
-from app import db, NewsItem, get_setting, get_news_api_url
+from app import fetch_news_items
 
 # Default feed used if no custom URL is configured.
 
-def fetch_news():
-    api_url = get_setting("news_api_url") or get_news_api_url()
-    resp = requests.get(api_url, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
-    items = data.get("results", data)
-    for item in items:
-        title = item.get("title", "")
-        url = item.get("link") or item.get("url", "")
-        summary = item.get("description", "")
-        if summary is None:
-            summary = ""
-        if not NewsItem.query.filter_by(url=url).first():
-            db.session.add(NewsItem(title=title, url=url, summary=summary))
-    db.session.commit()
-    old_items = (
-        NewsItem.query.order_by(NewsItem.created_at.desc())
-        .offset(25)
-        .all()
-    )
-    for item in old_items:
-        db.session.delete(item)
-    if old_items:
-        db.session.commit()
+def fetch_news() -> bool:
+    # Shares the admin's fetch so near-duplicate stories are collapsed here too
+    return fetch_news_items()
 
 if __name__ == "__main__":
     # Use an application context so SQLAlchemy can access the database
     from app import app
     with app.app_context():
-        fetch_news()
+        if not fetch_news():
+            # Non-zero exit so cron reports the failure
+            raise SystemExit("[ERROR] News fetch failed")
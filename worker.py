@@ -0,0 +1,68 @@
+"""Background worker that executes jobs queued from the admin page."""
+import argparse
+import threading
+import time
+
+from app import (
+    app,
+    create_tables,
+    claim_next_job,
+    run_job,
+    requeue_stale_jobs,
+    warm_up_llm,
+)
+
+
+def work(poll: float, once: bool, stop: threading.Event) -> None:
+    while not stop.is_set():
+        with app.app_context():
+            job = claim_next_job()
+            if job is not None:
+                print(f"Running job {job.id} ({job.kind})")
+                run_job(job)
+                print(f"Job {job.id} finished: {job.status}")
+                continue
+        if once:
+            return
+        stop.wait(poll)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run queued admin jobs")
+    parser.add_argument(
+        "--concurrency", type=int, default=1, help="Number of jobs this worker runs at once"
+    )
+    parser.add_argument(
+        "--poll", type=float, default=2.0, help="Seconds to wait when the queue is empty"
+    )
+    parser.add_argument(
+        "--once", action="store_true", help="Exit when the queue is empty"
+    )
+    args = parser.parse_args()
+
+    with app.app_context():
+        create_tables()
+        requeued = requeue_stale_jobs()
+        if requeued:
+            print(f"Requeued {requeued} stale job(s)")
+    warm_up_llm()
+
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=work, args=(args.poll, args.once, stop), daemon=True)
+        for _ in range(max(1, args.concurrency))
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        print("Stopping after the running jobs finish...")
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+if __name__ == "__main__":
+    main()